@@ -0,0 +1,276 @@
+'''
+<Embedded System Design>
+This program benchmarks the minimization of the runtime controller tables, to catch the performance regressions and to
+size the machines for the bigger tables.
+
+It minimizes the tables in examples/ and a set of generated tables (the scaling tiers) with minimize_table.py, and records
+for each of them the wall clock time of each phase of the QMM, the counters of the QMM (qm_userInputFile.QMStats), the peak memory and
+the compression ratio.
+The tiers are generated by testcase_gen/generate_tables.py, varying one of the number of variables, the value count,
+the number of entries and the merging type at a time. The random seed of each tier is fixed, so that the tables are the same
+in every run.
+
+Each table is minimized in a separate process (this program invoked with --single), so that the peak memory of one table
+is not hidden by the ones before it.
+The results are written to a JSON file. If a baseline (the results file of an earlier run) is given, the results are
+compared against it, and the program exits with the status 1 if a table became slower or larger (beyond the tolerance).
+
+usage:
+python benchmark.py <results file> [--baseline <results file>] [--tiers quick|full|none] [--no-examples]
+'''
+
+import sys
+import os
+import glob
+import json
+import time
+import zlib
+import shutil
+import platform
+import tempfile
+import argparse
+import resource
+import subprocess
+import minimize_table
+import read_table
+import qm_userInputFile as qm
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "testcase_gen"))
+import generate_tables
+
+PHASES = ["loading", "grouping", "merging", "chart", "essentials", "covering", "writing"]
+
+## the scaling tiers. each tier is (name, number of variables, value count, number of modes, type of table, number of entries),
+## optionally followed by a dict of the workload profile settings of generate_tables.Config (e.g. the pattern or the density).
+## the number of entries is limited by the number of combinations of the variables (as in generate_tables.py).
+## the quick tiers vary one dimension at a time around 3-4 variables with 1000 entries, the full tiers go further.
+QUICK_TIERS = [
+    ("vars-2", 2, 6, 4, 2, 1000),
+    ("vars-3", 3, 6, 4, 2, 1000),
+    ("vars-4", 4, 6, 4, 2, 1000),
+    ("vars-5", 5, 6, 4, 2, 1000),
+    ("values-4", 3, 4, 4, 2, 1000),
+    ("values-8", 3, 8, 4, 2, 1000),
+    ("values-12", 3, 12, 4, 2, 1000),
+    ("entries-250", 4, 8, 4, 2, 250),
+    ("entries-1000", 4, 8, 4, 2, 1000),
+    ("entries-4000", 4, 8, 4, 2, 4000),
+    ("merging-low", 3, 8, 4, 1, 500),
+    ("merging-medium", 3, 8, 4, 2, 500),
+    ("merging-high", 3, 8, 4, 3, 500),
+    ("blocks", 3, 8, 4, 2, 500, {"pattern": "blocks"}),
+    ("sparse", 3, 8, 4, 2, 500, {"density": 0.5}),
+]
+FULL_TIERS = QUICK_TIERS + [
+    ("vars-6", 6, 6, 4, 2, 4000),
+    ("values-16", 3, 16, 4, 2, 4000),
+    ("entries-16000", 4, 12, 8, 2, 16000),
+    ("merging-low-large", 4, 8, 8, 1, 4000),
+    ("merging-high-large", 4, 12, 8, 3, 16000),
+]
+TIERS = {"quick": QUICK_TIERS, "full": FULL_TIERS, "none": []}
+
+
+## generates the table of one tier in file_name, with the random seed derived from the name of the tier
+def generate_tier_table(file_name, tier):
+    name, num_var, value_count, num_modes, type_of_table, num_of_entries = tier[:6]
+    cfg = generate_tables.Config()
+    cfg.num_of_tables = 1
+    cfg.num_of_var_min = cfg.num_of_var_max = num_var
+    cfg.num_of_modes_min = cfg.num_of_modes_max = num_modes
+    cfg.value_count_min = cfg.value_count_max = value_count
+    cfg.type_of_table = type_of_table
+    cfg.num_of_entries_max = num_of_entries
+    cfg.seed = zlib.crc32(name) & 0xffffffff
+    if len(tier) > 6:
+        for setting, value in tier[6].items():
+            setattr(cfg, setting, value)
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")          ## generate_one_table prints the entry counts
+    try:
+        generate_tables.generate_one_table(file_name, cfg)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+## minimizes one table in this process and returns its results as a dict.
+## the peak memory (resident set size) is in KB, as reported by the operating system for this process.
+def run_single(in_file, out_file, cover_method, time_budget, node_budget):
+    start = time.time()
+    maps, num_var, value_count, initial_table_size, dont_cares = read_table.table_to_map(in_file)
+    loading = time.time() - start
+    mode_stats = {}
+    final_table_size, all_optimal = minimize_table.minimize_using_qm(maps, out_file, num_var, value_count, cover_method,
+                                                                     time_budget, node_budget, stats=mode_stats, dont_cares=dont_cares)
+    total = time.time() - start
+    stats = qm.QMStats()
+    for j in sorted(mode_stats):
+        stats.merge(mode_stats[j])
+    phase_times = stats.phase_times
+    phase_times["loading"] = loading
+    ## the time not spent in the QMM phases is spent in writing the output
+    phase_times["writing"] = max(0.0, total - sum(phase_times.values()))
+    compression = None
+    if final_table_size > 0:
+        compression = float(initial_table_size) / final_table_size
+    return {"time": total,
+            "phases": phase_times,
+            "counters": stats.counters,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "num_var": num_var,
+            "value_count": value_count,
+            "initial_size": initial_table_size,
+            "final_size": final_table_size,
+            "compression": compression,
+            "optimal": all_optimal}
+
+
+## minimizes one table in a new process (this program invoked with --single) and returns its results as a dict,
+## or a dict with the error message if the process failed
+def run_table(in_file, out_file, args):
+    command = [sys.executable, os.path.abspath(__file__), "--single", in_file, out_file, "--cover-method", args.cover_method]
+    if args.time_budget is not None:
+        command += ["--time-budget", str(args.time_budget)]
+    if args.node_budget is not None:
+        command += ["--node-budget", str(args.node_budget)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output, errors = process.communicate()
+    lines = output.strip().split("\n")
+    if process.returncode != 0 or not lines[-1].startswith("{"):
+        return {"error": errors.strip().split("\n")[-1] or ("exit status %d" % process.returncode)}
+    return json.loads(lines[-1])         ## the results are the last line of the output
+
+
+## compares the results against the baseline results, for the tables present in both.
+## a table regresses if its final size is larger, or its time or peak memory is larger by more than the tolerance
+## (a fraction of the baseline). differences of the time below min_time seconds are ignored as noise.
+## prints the comparison and returns the list of the names of the regressed tables
+def compare_results(results, baseline, tolerance, min_time=0.05):
+    previous = dict((entry["name"], entry) for entry in baseline["results"])
+    regressed = []
+    print "\n%-22s %10s %10s %7s %12s %8s" % ("table", "base (s)", "now (s)", "ratio", "size", "memory")
+    for entry in results:
+        old = previous.get(entry["name"])
+        if old is None or "error" in old or "error" in entry:
+            continue
+        problems = []
+        ratio = entry["time"] / old["time"] if old["time"] > 0 else 1.0
+        if entry["time"] > old["time"] * (1 + tolerance) and entry["time"] - old["time"] > min_time:
+            problems.append("time")
+        if entry["final_size"] > old["final_size"]:
+            problems.append("size")
+        if entry["peak_rss_kb"] > old["peak_rss_kb"] * (1 + tolerance):
+            problems.append("memory")
+        print "%-22s %10.3f %10.3f %7.2f %5d->%-6d %7.2f %s" % (entry["name"], old["time"], entry["time"], ratio,
+                                                                 old["final_size"], entry["final_size"],
+                                                                 float(entry["peak_rss_kb"]) / max(1, old["peak_rss_kb"]),
+                                                                 " ".join(problems))
+        if problems:
+            regressed.append(entry["name"])
+    return regressed
+
+
+## the main function.
+## reads the command line arguments, runs the benchmark, writes the results and compares them against the baseline
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Benchmark the minimization of the runtime controller tables",
+                                     epilog="example: python benchmark.py results.json --baseline baseline.json")
+    parser.add_argument("results_file", nargs="?", help="JSON file to write the results to")
+    parser.add_argument("--baseline", default=None, help="results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed increase of the time and the peak memory over the baseline, as a fraction (default: 0.25)")
+    parser.add_argument("--examples", default=os.path.join(here, "..", "examples"),
+                        help="directory of the example tables, the files test_*.txt in it are benchmarked (default: ../examples)")
+    parser.add_argument("--no-examples", action="store_true", help="skip the example tables")
+    parser.add_argument("--tiers", choices=sorted(TIERS.keys()), default="quick",
+                        help="set of the generated scaling tiers (default: quick)")
+    parser.add_argument("--work-dir", default=None,
+                        help="directory for the generated tables and the minimized outputs, kept after the run "
+                             "(default: a temporary directory, removed after the run)")
+    parser.add_argument("--cover-method", choices=["bnb", "petrick", "zdd"], default="bnb",
+                        help="method to find the minimum cover of the prime implicant chart (default: bnb)")
+    parser.add_argument("--time-budget", type=float, default=None, help="wall clock budget in seconds for each table")
+    parser.add_argument("--node-budget", type=int, default=None, help="work budget (search nodes) for the cover search of each mode")
+    parser.add_argument("--single", nargs=2, metavar=("IN_FILE", "OUT_FILE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        result = run_single(args.single[0], args.single[1], args.cover_method, args.time_budget, args.node_budget)
+        print json.dumps(result)
+        return 0
+    if args.results_file is None:
+        parser.error("the results file is required")
+
+    work_dir = args.work_dir
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix="qmm_benchmark_")
+    elif not os.path.isdir(work_dir):
+        os.makedirs(work_dir)
+
+    ## the list of the tables as (name, file name)
+    tables = []
+    if not args.no_examples:
+        files = glob.glob(os.path.join(args.examples, "test_*.txt"))
+        files.sort(key=lambda f: (len(f), f))           ## test_2 before test_10
+        for f in files:
+            tables.append((os.path.splitext(os.path.basename(f))[0], f))
+    for tier in TIERS[args.tiers]:
+        file_name = os.path.join(work_dir, "tier_" + tier[0] + ".txt")
+        generate_tier_table(file_name, tier)
+        tables.append(("tier-" + tier[0], file_name))
+
+    results = []
+    print "%-22s %8s %8s %8s %10s %s" % ("table", "initial", "final", "ratio", "time (s)", "peak memory (KB)")
+    try:
+        for name, file_name in tables:
+            entry = run_table(file_name, os.path.join(work_dir, "out_" + name + ".txt"), args)
+            entry["name"] = name
+            entry["file"] = file_name
+            results.append(entry)
+            if "error" in entry:
+                print "%-22s failed: %s" % (name, entry["error"])
+            else:
+                print "%-22s %8d %8d %8.2f %10.3f %d" % (name, entry["initial_size"], entry["final_size"],
+                                                        entry["compression"] or 0, entry["time"], entry["peak_rss_kb"])
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    ## total time of each phase over all the tables
+    totals = dict((phase, 0.0) for phase in PHASES)
+    for entry in results:
+        for phase, t in entry.get("phases", {}).items():
+            totals[phase] = totals.get(phase, 0.0) + t
+    print "\ntime per phase (s):", ", ".join("%s %.3f" % (phase, totals[phase]) for phase in PHASES)
+
+    fout = open(args.results_file, "w")
+    json.dump({"date": time.strftime("%Y-%m-%d %H:%M:%S"),
+               "python": platform.python_version(),
+               "machine": platform.platform(),
+               "tiers": args.tiers,
+               "cover_method": args.cover_method,
+               "time_budget": args.time_budget,
+               "node_budget": args.node_budget,
+               "phase_totals": totals,
+               "results": results}, fout, indent=1, sort_keys=True)
+    fout.close()
+
+    status = 0
+    if any("error" in entry for entry in results):
+        status = 1
+    if args.baseline is not None:
+        fp = open(args.baseline, "r")
+        baseline = json.load(fp)
+        fp.close()
+        regressed = compare_results(results, baseline, args.tolerance)
+        if regressed:
+            print "\nregressions:", ", ".join(regressed)
+            status = 1
+        else:
+            print "\nno regressions against", args.baseline
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
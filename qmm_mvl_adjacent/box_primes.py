@@ -0,0 +1,82 @@
+'''
+<Logic Design>
+This program finds the prime implicants of a set of multi-valued minterms directly, as the maximal boxes of the set.
+It is used in place of the merging of the minterms (combinePairs) by qm_userInputFile.py when the domain of the minterms is too
+large for the bitmaps of dense_primes.py, and finds the same prime implicants.
+
+A prime implicant is a maximal box: a range of values for each variable, such that every point of the box is a minterm
+(or a don't care), and which can not be extended by one value in any variable (up or down).
+The merging of the minterms makes the same implicant through many different orders of merging, and then removes the duplicates.
+Here every prime implicant is made only once, and no implicant other than the prime implicants is made.
+
+Here is the algorithm (one variable at a time)
+1. The points are split into layers by the value of the first variable, each layer being the set of the points of the other variables.
+2. For each range a..b of the values of the first variable, the points common to the layers a to b are intersected, extending b
+   one value at a time until the intersection is empty.
+3. The maximal boxes of the intersection, in the other variables, are found in the same way (recursively). With the range a..b,
+   each of them is a maximal box of the set, unless it is contained in the layer a-1 or b+1 (then it can be extended).
+4. For the last variable, the maximal boxes are the runs of consecutive values.
+The maximal boxes of the same set of points (in the same variables) are found only once.
+
+'''
+
+import itertools
+
+
+## finds the prime implicants (maximal boxes) of the points (the minterms and the don't cares), each a tuple of n_var integers.
+## returns the list of the prime implicants, each a tuple of (lo, hi) pairs
+def find_primes(points):
+    if len(points) == 0:
+        return []
+    n_var = len(points[0])
+    memo = [{} for j in range(n_var)]
+    return maximal_boxes(frozenset(tuple(p) for p in points), 0, n_var, memo)
+
+
+## returns the maximal boxes of the points in the variables j to n_var-1 (each point a tuple of the values of these variables).
+## memo[j] is the dict of the boxes found for each set of points in the variables from j.
+def maximal_boxes(points, j, n_var, memo):
+    boxes = memo[j].get(points)
+    if boxes is not None:
+        return boxes
+    boxes = []
+    if j == n_var - 1:
+        ## the runs of the consecutive values
+        values = sorted(p[0] for p in points)
+        start = values[0]
+        for k in range(1, len(values) + 1):
+            if k == len(values) or values[k] != values[k-1] + 1:
+                boxes.append(((start, values[k-1]),))
+                if k < len(values):
+                    start = values[k]
+    else:
+        layers = {}
+        for p in points:
+            layers.setdefault(p[0], set()).add(p[1:])
+        for a in sorted(layers):
+            below = layers.get(a - 1)
+            common = layers[a]
+            b = a
+            while True:
+                above = layers.get(b + 1)
+                for box in maximal_boxes(frozenset(common), j + 1, n_var, memo):
+                    if not (box_inside(box, below) or box_inside(box, above)):
+                        boxes.append(((a, b),) + box)
+                if above is None:
+                    break
+                common = common & above
+                if not common:
+                    break
+                b += 1
+    memo[j][points] = boxes
+    return boxes
+
+
+## returns True if every point of the box is in the layer (a set of points, or None for an empty layer)
+def box_inside(box, layer):
+    if layer is None:
+        return False
+    for p in itertools.product(*[range(lo, hi + 1) for lo, hi in box]):
+        if p not in layer:
+            return False
+    return True
@@ -0,0 +1,125 @@
+'''
+<Logic Design>
+This program finds the prime implicants of a set of multi-valued minterms over a small domain with bitmap operations.
+It is used in place of the merging of the minterms (combinePairs) by qm_userInputFile.py, and finds the same prime implicants.
+
+A prime implicant is a maximal box: a range of values for each variable, such that every point of the box is a minterm
+(or a don't care), and which can not be extended by one value in any variable (up or down).
+
+The points of the bounding box are the bits of an integer bitmap, at their mixed radix code (the first variable is the most
+significant one, as in qm_userInputFile.encode_minterm, but relative to the lower corner of the box).
+Shifting the bitmap right by the stride of the variable j moves the point x+1 (in the variable j) onto the point x.
+
+Here is the algorithm
+1. A[L], for a vector L of lengths (one for each variable), is the bitmap of the points x such that the box from x with the
+   lengths L is inside the set. A[1,1,..,1] is the bitmap of the minterms and the don't cares.
+2. A[L + 1 in the variable j] = A[L] & (A[L] >> stride j), masked to the points not on the last value of the variable j.
+   The lengths are enumerated in the increasing order of their sum, each A[L] being made from one smaller one.
+3. The box from x with the lengths L is maximal if it can not be extended up (x is not in A[L + 1 in j]) or down
+   (x - 1 in j is not in A[L + 1 in j], i.e. x is not in A[L + 1 in j] << stride j), for each variable j.
+4. The set bits of the maximal bitmap are decoded back into the prime implicants.
+
+Every step processes all the points of the bitmap at once, instead of comparing the implicants in pairs.
+The work is the number of vectors L for which a box fits in the set, times the size of the bitmap. It is small for the sets
+made of many small boxes, but for a set with large boxes (up to the whole bounding box, when every point is a minterm) nearly
+every L fits, and box_primes.py is much faster. As the number of the vectors L is not known in advance, find_primes can be
+given a work limit, and gives up when it runs out. The automatic choice of qm_userInputFile.py allows the work which box_primes.py
+would have taken for the points and for the prime implicants found so far (DENSE_WORK_PER_POINT and DENSE_WORK_PER_PRIME bits,
+measured against box_primes.py), so that the work lost when it gives up is about the time box_primes.py takes.
+
+'''
+
+import min_cover
+
+DENSE_LIMIT = 1 << 22       ## the largest number of points in the bounding box for which the bitmaps are tried
+DENSE_WORK_PER_POINT = 1 << 12     ## the work (bits of the bitmaps made) allowed for each point when chosen automatically
+DENSE_WORK_PER_PRIME = 1 << 19     ## and for each prime implicant found
+
+
+## the number of points in the bounding box of the points (each a tuple of integers)
+def box_size(points):
+    size = 1
+    for j in range(len(points[0])):
+        size *= max(p[j] for p in points) - min(p[j] for p in points) + 1
+    return size
+
+
+## finds the prime implicants (maximal boxes) of the points (the minterms and the don't cares), each a tuple of n_var integers.
+## work_limit, if not None, is the largest total number of bits of the bitmaps A[L] made, raised by work_per_prime for each
+## prime implicant found.
+## returns the list of the prime implicants, each a tuple of (lo, hi) pairs, in the increasing order of the sum of their lengths,
+## or None if the work limit is reached
+def find_primes(points, work_limit=None, work_per_prime=0):
+    if len(points) == 0:
+        return []
+    n_var = len(points[0])
+    low = [min(p[j] for p in points) for j in range(n_var)]
+    radix = [max(p[j] for p in points) - low[j] + 1 for j in range(n_var)]
+    strides = [1] * n_var
+    for j in range(n_var - 2, -1, -1):
+        strides[j] = strides[j + 1] * radix[j + 1]
+    size = strides[0] * radix[0]
+
+    def encode(p):
+        code = 0
+        for j in range(n_var):
+            code += (p[j] - low[j]) * strides[j]
+        return code
+
+    ## not_last[j] is the bitmap of the points not on the last value of the variable j
+    not_last = []
+    for j in range(n_var):
+        rows = (1 << ((radix[j] - 1) * strides[j])) - 1        ## the values of j other than the last, within one period
+        not_last.append(repeat_rows(rows, j, strides, radix, size))
+
+    ## the bitmaps A[L] for each vector of lengths L, level by level in the increasing order of sum(L)
+    anchors = {tuple([1] * n_var): min_cover.bits_from_indices([encode(p) for p in points], size)}
+    level = list(anchors.keys())
+    primes = []
+    work = 0
+    while level:
+        next_level = []
+        maximal = []
+        for lengths in level:
+            bits = anchors[lengths]
+            extendable = 0
+            for j in range(n_var):
+                if lengths[j] >= radix[j]:
+                    continue
+                longer = lengths[:j] + (lengths[j] + 1,) + lengths[j+1:]
+                grown = anchors.get(longer)
+                if grown is None:
+                    work += size
+                    if work_limit is not None and work > work_limit + work_per_prime * len(primes):
+                        return None
+                    grown = bits & (bits >> strides[j]) & not_last[j]
+                    anchors[longer] = grown
+                    if grown:
+                        next_level.append(longer)
+                if grown:
+                    extendable |= grown | (grown << strides[j])         ## can be extended up, or down
+            maximal.append((lengths, bits & ~extendable))
+        for lengths, bits in maximal:
+            for code in min_cover.indices_from_bits(bits):
+                term = []
+                for j in range(n_var):
+                    v = low[j] + (code // strides[j]) % radix[j]
+                    term.append((v, v + lengths[j] - 1))
+                primes.append(tuple(term))
+        ## only the bitmaps of the next level are needed from now on
+        anchors = dict((lengths, anchors[lengths]) for lengths in next_level)
+        level = next_level
+
+    return primes
+
+
+## the bitmap of the points whose value of the variable j (relative to the lower corner) is rows, which is a bitmap of
+## one period of the variable j (all the points with the same values of the variables before j)
+def repeat_rows(rows, j, strides, radix, size):
+    period = strides[j] * radix[j]
+    pattern = rows
+    width = period
+    while width < size:         ## doubling the pattern, instead of adding one period at a time
+        pattern |= pattern << width
+        width *= 2
+    return pattern & ((1 << size) - 1)
@@ -0,0 +1,272 @@
+'''
+<Embedded System Design>
+This program compiles a minimized runtime controller table (the output of minimize_table.py, one ranges:mode line for each row)
+into a structure for a fast lookup of the mode of a context (the values of the variables).
+
+The rows are matched in the order of the table, the first row whose ranges contain the context gives its mode
+(same as the linear scan of the table done by the runtime controller). A context matched by no row has the mode None.
+
+Two structures are used:
+1. a direct lookup array for the small domains: the mode of every context, indexed by the mixed radix code of the context
+   (see qm_userInputFile.encode_minterm). A lookup is a single index computation.
+2. a decision tree for the larger domains: each node partitions the values of one variable into the intervals where the same
+   rows match, and has a child (the node of the next variable) for each interval. A lookup is one binary search per variable.
+   The nodes with the same set of rows are shared.
+
+The program also runs a micro-benchmark which compares the lookup time with the linear scan of the table.
+
+usage:
+python lookup_table.py <minimized table> [--contexts <table>] [--count <number of random contexts>]
+
+example:
+python lookup_table.py out.txt --contexts ../examples/test_0.txt
+'''
+
+import sys
+import time
+import array
+import bisect
+import random
+import argparse
+import qm_userInputFile as qm
+import read_table
+
+DENSE_LIMIT = 1 << 20       ## the largest domain for which the direct lookup array is used
+
+
+## reads a minimized table, returns the list of its rows as (implicant, mode), where the implicant is a tuple of (lo, hi) pairs
+def read_rules(file_name):
+    rules = []
+    fp = open(file_name, "r")
+    line_num = 0
+    for line in fp:
+        line_num += 1
+        line = line.strip()
+        if line == '':
+            continue
+        fields = line.split(":")
+        if len(fields) != 2:
+            fp.close()
+            raise ValueError("line %d: expected ranges:mode, found '%s'" % (line_num, line))
+        rules.append((qm.parse_term(fields[0]), int(fields[1])))
+    fp.close()
+    return rules
+
+
+## the mode of the context by the linear scan of the rows, i.e. the mode of the first row containing the context (or None)
+def linear_lookup(rules, context):
+    for term, mode in rules:
+        for j in range(len(term)):
+            if not term[j][0] <= context[j] <= term[j][1]:
+                break
+        else:
+            return mode
+    return None
+
+
+## class to contain the compiled lookup structure of a minimized table.
+## rules is the list of (implicant, mode) in the order of the table. value_count is the maximum value of each variable,
+## by default the largest value in the rows (the contexts beyond it are matched by no row).
+## the direct lookup array is used if the domain has at most dense_limit contexts, the decision tree otherwise.
+## if all_rows is True, a lookup gives the tuple of the indexes of all the rows containing the context (in the table order)
+## instead of the mode of the first one, and the decision tree is always used (see verify_table.py).
+class LookupTable:
+    def __init__(self, rules, value_count=None, dense_limit=DENSE_LIMIT, all_rows=False):
+        if value_count is None:
+            value_count = [max(term[j][1] for term, mode in rules) for j in range(len(rules[0][0]))]
+        self.value_count = [int(v) for v in value_count]
+        self.n_var = len(self.value_count)
+        self.modes = sorted(set(mode for term, mode in rules))
+        self.all_rows = all_rows
+        domain_size = 1
+        for v in self.value_count:
+            domain_size *= v + 1
+        self.dense = domain_size <= dense_limit and not all_rows
+        if self.dense:
+            self.array = self.build_array(rules, domain_size)
+            self.tree = None
+        else:
+            self.array = None
+            self.tree = self.build_tree(rules, 0, tuple(range(len(rules))), {})
+
+    ## fills the direct lookup array with the mode of every context, -1 where no row matches.
+    ## the rows are painted in the reverse order, so that the first matching row is the one left in the array.
+    def build_array(self, rules, domain_size):
+        table = array.array('l', [-1]) * domain_size
+        for term, mode in reversed(rules):
+            term = [(lo, min(hi, self.value_count[j])) for j, (lo, hi) in enumerate(term)]
+            if any(lo > hi for lo, hi in term):
+                continue
+            ## the codes of the contexts in the implicant, one variable at a time
+            codes = [0]
+            for j in range(self.n_var):
+                radix = self.value_count[j] + 1
+                lo, hi = term[j]
+                codes = [code * radix + v for code in codes for v in range(lo, hi + 1)]
+            for code in codes:
+                table[code] = mode
+        return table
+
+    ## builds the decision tree node of the variable j for the rows in active (their indexes, in the table order).
+    ## a node is (boundaries, children): the child k is for the values from boundaries[k] to boundaries[k+1]-1,
+    ## and the last child (for the values beyond every row) is None. the leaf (after the last variable) is the mode of the first row,
+    ## or active if all_rows is True.
+    ## the nodes are memoized by (j, active), so that the identical subtrees are shared.
+    def build_tree(self, rules, j, active, memo):
+        if len(active) == 0:
+            return None
+        if j == self.n_var:
+            if self.all_rows:
+                return active
+            return rules[active[0]][1]
+        key = (j, active)
+        if key in memo:
+            return memo[key]
+        starts = {}             ## the rows starting at each value, and the rows ending just before it
+        ends = {}
+        for r in active:
+            lo, hi = rules[r][0][j]
+            starts.setdefault(lo, []).append(r)
+            ends.setdefault(hi + 1, []).append(r)
+        boundaries = sorted(set([0]) | set(starts) | set(ends))
+        children = []
+        current = set()         ## the rows containing the values of the interval, updated at each boundary
+        for k in range(len(boundaries) - 1):
+            v = boundaries[k]
+            current.difference_update(ends.get(v, ()))
+            current.update(starts.get(v, ()))
+            subset = tuple(sorted(current))         ## in the table order, as the indexes of the rows are
+            children.append(self.build_tree(rules, j + 1, subset, memo))
+        children.append(None)
+        node = (boundaries, children)
+        memo[key] = node
+        return node
+
+    ## returns the mode of one context (a sequence of n_var integers), or None if no row matches it.
+    ## if all_rows is True, returns the tuple of the rows containing it instead
+    def lookup_one(self, context):
+        if self.dense:
+            code = 0
+            for j in range(self.n_var):
+                v = context[j]
+                if v < 0 or v > self.value_count[j]:
+                    return None
+                code = code * (self.value_count[j] + 1) + v
+            mode = self.array[code]
+            if mode < 0:
+                return None
+            return mode
+        node = self.tree
+        for j in range(self.n_var):
+            if node is None:
+                return None
+            boundaries, children = node
+            k = bisect.bisect_right(boundaries, context[j]) - 1
+            if k < 0:
+                return None
+            node = children[k]
+        return node
+
+    ## returns the list of the modes of the contexts (None for a context which no row matches)
+    def lookup(self, contexts):
+        lookup_one = self.lookup_one
+        return [lookup_one(context) for context in contexts]
+
+
+## compiles the minimized table in the file, returns its LookupTable
+def compile_table(file_name, value_count=None, dense_limit=DENSE_LIMIT):
+    return LookupTable(read_rules(file_name), value_count, dense_limit)
+
+
+## reads the contexts (and their modes) from a table in the input format of minimize_table.py
+## returns the list of the contexts, the list of their modes and the value count
+def read_contexts(file_name):
+    maps, num_var, value_count, initial_table_size, dont_cares = read_table.table_to_map(file_name)
+    contexts, modes = map_contexts(maps, value_count)
+    return contexts, modes, value_count
+
+
+## returns the contexts in the map of read_table.table_to_map (the minterm codes of each mode), and the list of their modes
+def map_contexts(maps, value_count):
+    contexts = []
+    modes = []
+    for mode in range(len(maps)):
+        for code in maps[mode]:
+            contexts.append(qm.decode_minterm(code, value_count))
+            modes.append(mode)
+    return contexts, modes
+
+
+## checks the rules (a list of (implicant, mode), first match wins) against the map of a table (the minterm codes of each mode),
+## returns the number of minterms for which the rules give a different mode (0 if they are equivalent to the table)
+def check_rules(rules, maps, value_count):
+    contexts, modes = map_contexts(maps, value_count)
+    if len(rules) == 0:
+        return len(contexts)
+    result = LookupTable(rules, value_count).lookup(contexts)
+    return sum(1 for a, b in zip(result, modes) if a != b)
+
+
+## times the lookup of every context by the function, returns the result and the time per lookup in microseconds
+def time_lookups(function, contexts, repeat=3):
+    best = None
+    result = None
+    for i in range(repeat):
+        start = time.time()
+        result = function(contexts)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return result, best * 1e6 / max(1, len(contexts))
+
+
+## the main function.
+## compiles the minimized table and compares the lookup time against the linear scan (the micro-benchmark)
+def main():
+    parser = argparse.ArgumentParser(description="Compile a minimized controller table and benchmark its lookup against a linear scan",
+                                     epilog="example: python lookup_table.py out.txt --contexts ../examples/test_0.txt")
+    parser.add_argument("table", help="minimized table (the output of minimize_table.py)")
+    parser.add_argument("--contexts", default=None,
+                        help="original table (the input of minimize_table.py): its rows are the contexts looked up, "
+                             "and their modes are checked")
+    parser.add_argument("--count", type=int, default=10000,
+                        help="number of random contexts looked up if no --contexts table is given (default: 10000)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random contexts (default: 0)")
+    parser.add_argument("--dense-limit", type=int, default=DENSE_LIMIT,
+                        help="largest domain for the direct lookup array, the decision tree is used beyond it (default: %d)" % DENSE_LIMIT)
+    args = parser.parse_args()
+
+    rules = read_rules(args.table)
+    if len(rules) == 0:
+        print "the table is empty"
+        return 1
+    expected = None
+    value_count = None
+    if args.contexts is not None:
+        contexts, expected, value_count = read_contexts(args.contexts)
+    else:
+        domain = [max(term[j][1] for term, mode in rules) for j in range(len(rules[0][0]))]
+        rng = random.Random(args.seed)
+        contexts = [tuple(rng.randint(0, v) for v in domain) for i in range(args.count)]
+
+    start = time.time()
+    compiled = LookupTable(rules, value_count, args.dense_limit)
+    compile_time = time.time() - start
+
+    linear, linear_time = time_lookups(lambda contexts: [linear_lookup(rules, c) for c in contexts], contexts)
+    result, compiled_time = time_lookups(compiled.lookup, contexts)
+
+    print "rows:", len(rules), " contexts:", len(contexts), " structure:", "array" if compiled.dense else "decision tree"
+    print "compile time: %.3f ms" % (compile_time * 1e3)
+    print "linear scan : %.3f us per lookup" % linear_time
+    print "compiled    : %.3f us per lookup (%.1fx)" % (compiled_time, linear_time / max(compiled_time, 1e-9))
+    if result != linear:
+        print "error: the compiled lookup differs from the linear scan"
+        return 1
+    if expected is not None and result != expected:
+        print "error: the minimized table gives a different mode for", sum(1 for a, b in zip(result, expected) if a != b), "contexts"
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
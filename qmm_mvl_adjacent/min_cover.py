@@ -0,0 +1,449 @@
+'''
+<Logic Design>
+This program finds the minimum cover of a prime implicant chart. It is used in place of Petrick's method by qm_userInputFile.py,
+as the multiplication in Petrick's method grows exponentially (in time and memory) on charts with cyclic cores.
+
+The chart is a list of integer bitsets, one for each prime implicant (row), bit i being set if the row covers the minterm i (column).
+The cover is exact: it has the minimum number of rows and, among those, the minimum cost, which is the same answer as
+Petrick's method followed by the cost computation in find_minimum_cost.
+
+Here is the algorithm (branch and bound)
+1. Find a greedy cover, which is the initial upper bound
+2. Reduce the chart: select the essential rows, remove the dominated columns and rows (see reduce_chart)
+3. Prune the branch if the rows selected so far plus a lower bound for the uncovered columns can not improve on the best cover.
+   The lower bound is the number of uncovered columns which pairwise share no row (each needs a different row),
+   or the number of uncovered columns divided by the most columns covered by a single row, whichever is larger.
+4. If the chart falls apart into connected components (sets of columns sharing no row), search each of them separately
+5. Otherwise pick the uncovered column with the fewest rows, and the row covering the most columns among them.
+   Search the chart with this row included, then continue (from step 2) with this row excluded.
+The chart is first split into its connected components, which are searched separately (optionally in parallel),
+and their minimum covers combined.
+
+The search can be given a time budget (in seconds) and/or a work budget (number of search nodes). It then returns the best cover
+found when the budget runs out, which is at least as good as the greedy cover, and reports that it is not proven optimal.
+
+'''
+
+import binascii
+import time
+import itertools
+import multiprocessing
+
+SCAN_BITS = 4096            ## the length of a bitset beyond which indices_from_bits scans its binary string
+MAX_DEPTH = 500             ## the deepest recursion of the cover search, below the recursion limit of Python (1000)
+
+
+## creates an integer bitset with the bits at the given positions set
+def bits_from_indices(indices, size):
+    buf = bytearray((size >> 3) + 1)
+    for i in indices:
+        buf[-1 - (i >> 3)] |= 1 << (i & 7)          ## big endian byte order, so that the hex string below gives the integer
+    return int(binascii.hexlify(buf), 16)
+
+## returns the positions of the set bits of an integer bitset, in increasing order.
+## a bitset longer than SCAN_BITS (the bitmaps of dense_primes.py) is scanned as a string once, as clearing its lowest bit
+## one at a time copies the whole integer for each set bit
+def indices_from_bits(bits):
+    indices = []
+    if bits.bit_length() > SCAN_BITS:
+        s = bin(bits)[:1:-1]        ## the binary digits, the lowest bit first
+        i = s.find("1")
+        while i >= 0:
+            indices.append(i)
+            i = s.find("1", i + 1)
+        return indices
+    while bits:
+        low = bits & -bits
+        indices.append(low.bit_length() - 1)
+        bits ^= low
+    return indices
+
+
+## count the number of set bits in an integer bitset
+def popcount(bits):
+    return bin(bits).count("1")
+
+
+## for each column, make the bitset of the rows covering it
+def column_rows(rows):
+    cols = {}
+    for r in range(len(rows)):
+        for c in indices_from_bits(rows[r]):
+            cols[c] = cols.get(c, 0) | (1 << r)
+    return cols
+
+
+## greedy cover: repeatedly pick the row covering the most uncovered columns (lower cost first on a tie)
+## returns the list of chosen rows
+def greedy_cover(rows, costs, uncovered):
+    chosen = []
+    while uncovered:
+        best = None
+        best_key = None
+        for r in range(len(rows)):
+            gain = popcount(rows[r] & uncovered)
+            if gain == 0:
+                continue
+            key = (gain, -costs[r])
+            if best_key is None or key > best_key:
+                best = r
+                best_key = key
+        chosen.append(best)
+        uncovered &= ~rows[best]
+    return make_irredundant(rows, costs, chosen)
+
+
+## remove the rows from a cover whose columns are all covered by the other chosen rows (most costly and smallest rows first)
+def make_irredundant(rows, costs, chosen):
+    chosen = list(chosen)
+    for r in sorted(chosen, key=lambda r: (-costs[r], popcount(rows[r]))):
+        others = 0
+        for k in chosen:
+            if k != r:
+                others |= rows[k]
+        if rows[r] & ~others == 0:
+            chosen.remove(r)
+    return chosen
+
+
+## reduce the chart before searching for the cover. the following reductions are repeated until nothing changes:
+##   - essential rows: a column covered by only one row needs that row, which is selected and its columns removed
+##   - column dominance: a column whose rows are a superset of the rows of another column is removed,
+##     as it is covered whenever the other one is covered (one of the columns with the same rows is kept)
+##   - row dominance: a row whose columns are a subset of the columns of another row with the same or lower cost is removed
+##     (one of the rows with the same columns and cost is kept). it is skipped if row_dominance is False, as it drops
+##     some of the minimum covers when all of them are needed.
+## returns the list of the selected rows and the reduced chart (the removed rows and columns are cleared from the bitsets).
+## the minimum cover of the chart is the selected rows plus a minimum cover of the reduced chart.
+def reduce_chart(rows, costs, row_dominance=True):
+    rows = list(rows)
+    selected = []
+    changed = True
+    while changed:
+        changed = False
+        cols = column_rows(rows)
+
+        ## essential rows
+        covered = 0
+        for c in cols:
+            if cols[c] & (cols[c] - 1) == 0:        ## only one row covers this column
+                r = cols[c].bit_length() - 1
+                if rows[r]:
+                    covered |= rows[r]
+                    selected.append(r)
+                    rows[r] = 0
+        if covered:
+            for r in range(len(rows)):
+                rows[r] &= ~covered
+            changed = True
+            continue
+
+        ## column dominance, the columns with the fewest rows are the dominated ones, hence they are checked first
+        dropped = 0
+        for c2 in sorted(cols, key=lambda c: (popcount(cols[c]), c)):
+            if (dropped >> c2) & 1:
+                continue
+            r = (cols[c2] & -cols[c2]).bit_length() - 1     ## a dominating column is covered by every row covering c2, e.g. this one
+            for c1 in indices_from_bits(rows[r] & ~dropped):
+                if c1 != c2 and cols[c1] & cols[c2] == cols[c2]:
+                    dropped |= 1 << c1
+        if dropped:
+            for r in range(len(rows)):
+                rows[r] &= ~dropped
+            changed = True
+            continue
+
+        ## row dominance, the rows with the fewest columns (and the most costly) are the dominated ones, hence they are checked first
+        if row_dominance:
+            for r1 in sorted(range(len(rows)), key=lambda r: (popcount(rows[r]), -costs[r], r)):
+                if rows[r1] == 0:
+                    continue
+                c = (rows[r1] & -rows[r1]).bit_length() - 1     ## a dominating row covers every column of r1, e.g. this one
+                for r2 in indices_from_bits(cols[c]):
+                    if r2 != r1 and rows[r2] and rows[r1] & ~rows[r2] == 0 and costs[r2] <= costs[r1]:
+                        rows[r1] = 0
+                        changed = True
+                        break
+    return selected, rows
+
+
+## lower bound on the number of rows needed to cover the uncovered columns
+## cols gives the rows for each uncovered column. the columns with the fewest rows are tried first for the independent set.
+def lower_bound(uncovered, cols, max_gain):
+    blocked = 0             ## rows covering the independent columns chosen so far
+    independent = 0
+    for c in sorted(cols, key=lambda c: popcount(cols[c])):
+        if not (cols[c] & blocked):
+            independent += 1
+            blocked |= cols[c]
+    needed = (popcount(uncovered) + max_gain - 1) // max_gain
+    return max(independent, needed)
+
+
+## split the chart into its connected components, i.e. the sets of columns which share no row with the other sets.
+## returns the list of components, each being the list of its rows (in increasing order), the largest components first.
+def chart_components(rows):
+    parent = list(range(len(rows)))         ## union find over the rows, the rows covering the same column are joined
+    def find(r):
+        while parent[r] != r:
+            parent[r] = parent[parent[r]]
+            r = parent[r]
+        return r
+    cols = column_rows(rows)
+    for c in cols:
+        members = indices_from_bits(cols[c])
+        root = find(members[0])
+        for r in members[1:]:
+            other = find(r)
+            if other != root:
+                parent[other] = root
+    components = {}
+    for r in range(len(rows)):
+        if rows[r]:
+            components.setdefault(find(r), []).append(r)
+    return sorted(components.values(), key=lambda rs: (-len(rs), rs[0]))
+
+
+## makes the chart of one component, with the columns of the component renumbered from 0, so that the bitsets stay small
+def component_chart(rows, component):
+    col_list = set()
+    for r in component:
+        col_list.update(indices_from_bits(rows[r]))
+    position = {}
+    for c in sorted(col_list):
+        position[c] = len(position)
+    return [bits_from_indices([position[c] for c in indices_from_bits(rows[r])], len(position)) for r in component]
+
+
+## searches the minimum cover of one component, job is the tuple (rows, costs, find_all, time_budget, node_budget).
+## it is a separate function so that the components can be distributed to a pool of worker processes.
+def search_component(job):
+    rows, costs, find_all, time_budget, node_budget = job
+    return search_cover(rows, costs, find_all, time_budget, node_budget)
+
+
+## the minimum cover of all the columns set in the rows of the chart
+## the chart is split into its connected components which are searched separately, as the minimum cover of the chart is the
+## union of the minimum covers of its components. this avoids a search over the product of the components.
+## costs is the cost of each row (1 for each row if not given)
+## if find_all is True, all the covers with the minimum number of rows and minimum cost are returned (the cross product of
+## the minimum covers of the components), otherwise only one of them.
+## time_budget (seconds) and node_budget (number of search nodes, for each component) limit the search, None means no limit.
+## jobs is the number of worker processes to search the components in parallel.
+## returns the list of the minimum covers, each being a sorted list of row indices (same as the result of petrick_method),
+## and True if the covers are proven optimal (False if the search was stopped by the budget, or by MAX_DEPTH)
+def minimum_cover(rows, costs=None, find_all=False, time_budget=None, node_budget=None, jobs=1):
+    if costs is None:
+        costs = [1 for x in rows]
+    components = chart_components(rows)
+    if len(components) <= 1:
+        return search_cover(rows, costs, find_all, time_budget, node_budget)
+
+    job_list = []
+    for component in components:
+        job_list.append((component_chart(rows, component), [costs[r] for r in component], find_all, None, node_budget))
+
+    if jobs > 1:
+        if time_budget is not None:
+            share = time_budget * min(1.0, float(jobs) / len(job_list))
+            job_list = [job[:3] + (share,) + job[4:] for job in job_list]
+        pool = multiprocessing.Pool(min(jobs, len(job_list)))
+        try:
+            results = pool.map(search_component, job_list)      ## the results come back in the order of the components
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        ## the smallest components are searched first, each gets an equal share of the time left when it starts
+        results = [None] * len(job_list)
+        if time_budget is not None:
+            deadline = time.time() + time_budget
+        order = list(range(len(job_list) - 1, -1, -1))
+        for k in range(len(order)):
+            job = job_list[order[k]]
+            if time_budget is not None:
+                job = job[:3] + (max(0, deadline - time.time()) / (len(order) - k),) + job[4:]
+            results[order[k]] = search_component(job)
+
+    ## map the covers of the components back to the rows of the chart, and combine them
+    optimal = True
+    component_covers = []
+    for component, (covers, component_optimal) in zip(components, results):
+        optimal = optimal and component_optimal
+        component_covers.append([[component[r] for r in cover] for cover in covers])
+    if not find_all:
+        component_covers = [covers[:1] for covers in component_covers]
+    result = []
+    for combination in itertools.product(*component_covers):
+        cover = []
+        for part in combination:
+            cover.extend(part)
+        result.append(sorted(cover))
+    result.sort()
+    return result, optimal
+
+
+## class to contain the state shared by the recursive calls of the search: the weights of the rows and the budget
+## the weight of a row is big + cost, with big larger than the total cost, so that the weight of a cover orders the covers
+## by their number of rows first and their cost next.
+class SearchState:
+    def __init__(self, costs, time_budget, node_budget):
+        big = sum(costs) + 1
+        self.weights = [big + c for c in costs]
+        self.min_weight = big + min(costs)
+        self.deadline = None
+        if time_budget is not None:
+            self.deadline = time.time() + time_budget
+        self.node_budget = node_budget
+        self.nodes = 0
+        self.stopped = False        ## set when the budget runs out, the search then returns the best cover found so far
+        self.truncated = False      ## set when a branch is cut at MAX_DEPTH, the cover is then not proven optimal
+
+    ## counts a search node, returns True if the budget has run out
+    def tick(self):
+        self.nodes += 1
+        if self.node_budget is not None and self.nodes > self.node_budget:
+            self.stopped = True
+        elif self.deadline is not None and (self.nodes & 63) == 0 and time.time() > self.deadline:
+            self.stopped = True
+        return self.stopped
+
+
+## the branch and bound search for the minimum cover of all the columns set in the rows of the chart
+## arguments and result are the same as for minimum_cover
+def search_cover(rows, costs, find_all=False, time_budget=None, node_budget=None):
+    target = 0
+    for row in rows:
+        target |= row
+    if target == 0:
+        return [[]], True
+    state = SearchState(costs, time_budget, node_budget)
+
+    ## the greedy cover is the first solution and the initial upper bound
+    greedy = greedy_cover(rows, costs, target)
+    limit = sum(state.weights[r] for r in greedy)
+    found = search(list(rows), target, limit, find_all, state)
+    if found is None:
+        result = [sorted(greedy)]           ## no cover better than the greedy one
+    else:
+        weight, solutions = found
+        result = [sorted(solution) for solution in solutions]
+        if find_all and weight == limit and sorted(greedy) not in result:
+            result.append(sorted(greedy))
+    result.sort()
+    return result, not state.stopped and not state.truncated
+
+
+## weight of a list of rows
+def cover_weight(state, chosen):
+    return sum(state.weights[r] for r in chosen)
+
+
+## the recursive search. rows is the chart (the bitsets are changed), target the columns to be covered.
+## depth is the number of the enclosing calls: each included row and each component is searched by a recursive call, and a
+## branch deeper than MAX_DEPTH is completed with a greedy cover as if the budget had run out, instead of exceeding the
+## recursion limit.
+## returns (weight, solutions) with the best covers of weight below limit (or equal to limit, if find_all),
+## only one of them unless find_all, or None if there is no such cover.
+def search(rows, target, limit, find_all, state, depth=0):
+    prefix = []             ## rows selected by the reductions, part of every cover searched in this call
+    best_weight = None
+    best = []
+
+    ## returns the best weight and covers after adding the given covers of the given weight
+    ## covers equal to the best ones are kept only if find_all, and covers above the limit never
+    def record(weight, solutions):
+        if best_weight is None:
+            if weight < limit or (find_all and weight == limit):
+                return weight, list(solutions)
+        elif weight < best_weight:
+            return weight, list(solutions)
+        elif find_all and weight == best_weight:
+            return weight, best + list(solutions)
+        return best_weight, best
+
+    while True:
+        ## the columns which can not be covered any more make the branch infeasible
+        covered = 0
+        for r in range(len(rows)):
+            rows[r] &= target
+            covered |= rows[r]
+        if target & ~covered:
+            break
+
+        if depth >= MAX_DEPTH:
+            state.truncated = True
+        if depth >= MAX_DEPTH or state.tick():
+            ## budget exhausted (or too deep): complete the branch with a greedy cover
+            greedy = greedy_cover(rows, [state.weights[r] for r in range(len(rows))], target)
+            best_weight, best = record(cover_weight(state, prefix + greedy), [prefix + greedy])
+            break
+
+        selected, rows = reduce_chart(rows, state.weights, row_dominance=not find_all)
+        prefix = prefix + selected
+        target = 0
+        for row in rows:
+            target |= row
+        prefix_weight = cover_weight(state, prefix)
+        if target == 0:
+            best_weight, best = record(prefix_weight, [prefix])
+            break
+
+        bound = limit if best_weight is None else best_weight
+        cols = column_rows(rows)
+        max_gain = max(popcount(row) for row in rows)
+        lb = prefix_weight + lower_bound(target, cols, max_gain) * state.min_weight
+        if lb > bound or (lb == bound and not find_all):
+            break           ## this branch can not give a better cover (or another cover equally good, if find_all)
+
+        components = chart_components(rows)
+        if len(components) > 1:
+            ## search the components separately, each within the limit left by the lower bounds (or covers) of the others
+            bounds = []
+            for component in components:
+                component_target = 0
+                for r in component:
+                    component_target |= rows[r]
+                bounds.append(lower_bound(component_target, dict((c, cols[c]) for c in indices_from_bits(component_target)),
+                                          max(popcount(rows[r]) for r in component)) * state.min_weight)
+            total = prefix_weight
+            parts = []
+            for k in range(len(components) - 1, -1, -1):        ## the smallest components first
+                component_rows = [0] * len(rows)
+                component_target = 0
+                for r in components[k]:
+                    component_rows[r] = rows[r]
+                    component_target |= rows[r]
+                others = sum(bounds[:k])
+                part = search(component_rows, component_target, bound - total - others, find_all, state, depth + 1)
+                if part is None:
+                    parts = None
+                    break
+                total += part[0]
+                parts.append(part[1])
+            if parts is not None:
+                solutions = []
+                for combination in itertools.product(*parts):
+                    solution = list(prefix)
+                    for part in combination:
+                        solution.extend(part)
+                    solutions.append(solution)
+                best_weight, best = record(total, solutions)
+            break
+
+        ## branch on the row covering the most columns among the rows of the column with the fewest rows
+        c = min(cols, key=lambda c: (popcount(cols[c]), c))
+        r = max(indices_from_bits(cols[c]), key=lambda r: (popcount(rows[r]), -state.weights[r], -r))
+        included = list(rows)
+        included[r] = 0
+        part = search(included, target & ~rows[r], bound - prefix_weight - state.weights[r], find_all, state,
+                      depth + 1)
+        if part is not None:
+            best_weight, best = record(prefix_weight + state.weights[r] + part[0],
+                                       [prefix + [r] + sub for sub in part[1]])
+        ## continue with the row excluded
+        rows[r] = 0
+
+    if best_weight is None:
+        return None
+    return best_weight, best
@@ -6,11 +6,20 @@ This program reads the table entries for runtime controller and generates a mini
 This program uses a modified version of Quine Mccluskey method, extended to multi-valued logic.
 
 The input table is assumed to be enumerated with ranges converted to different integers, starting from 0.
-Pending: To use the range and generate the enumeration on its own.
+Optionally (--raw), the table has the raw values of the variables instead (e.g. the samples of a profiling trace), and each value
+is converted to the index of its step within the range of the variable (start end stepsize) while the table is read.
+The rows falling into the same steps are then collapsed into one.
 
 The code invokes the QMM (Quine Mc-Cluskey method for each of the modes separately and writes to the file each time for every mode.
-To invoke QMM, it generates a temp.txt in the format needed by QMM by parsing the entries from the input table.
-This is found efficient compared to doing it for all modes together.
+To invoke QMM, it passes the minterms parsed from the input table directly to the in-memory interface of QMM.
+This is found efficient compared to doing it for all modes together. The modes can also be minimized in parallel by a pool of worker processes.
+In the batch mode (--batch), all the tables of a directory are minimized in one run by a pool of worker processes, one table for each
+worker at a time, and a summary of all the tables is written.
+
+Optionally (--ordered), the modes are minimized jointly into an ordered list of rules, where the first matching rule gives the mode.
+The modes are taken from the smallest to the largest, and the minterms of the modes before a mode are its don't cares:
+they are matched by the earlier rules, hence the rules of the mode can overlap them. The large modes then need fewer, broader rules.
+The ordered rules are checked against every row of the table.
 
 Written By: Rajesh Kedia
 Last Edit : Sep. 9, 2018
@@ -18,113 +27,393 @@ Last Edit : Sep. 9, 2018
 '''
 
 import sys
-import math
 import os
+import array
+import time
+import argparse
+import json
+import csv
+import glob
+import multiprocessing
 import qm_userInputFile as qm
+import result_cache
+import read_table
+import lookup_table
+import dense_primes
+import verify_table
 
 ## this function appends the mode information to the reduced implicants obtained from QM method
 ## for the input table, it appends the mode in specified format and returns the updated list.
 def append_mode(reduced_table, mode):
     updated = []
     for i in range(len(reduced_table)):
-        updated.append(reduced_table[i][0]+":"+str(mode))
+        updated.append(reduced_table[i]+":"+str(mode))
     return updated
 
-## this function converts the table entries into a map where we maintain list of minterms for each mode separately
-def table_to_map(file_name):
-    fp = open(file_name, "r")
-    if fp.mode == "r":
-        print "file opened"
-
-    contents = fp.read()
-    contents = contents.split("\n")
-    num_var = int(contents[0])
-    num_modes = int(contents[1])
-    ## the map to store the minterms for each mode. It is a 2-D list.
-    maps = [[] for x in range(num_modes)]
-    value_count = [[] for x in range(num_var)]          ## based on specified min, max. and the step size, the number of distinct range is computed and assigned to value_count.
-    contents = contents[2:]                     # skip the first 2 rows which were headers for num_var and num_modes
-    ## reading the variable settings and updating the value_count list with count for each of them.
-    for i in range(num_var):
-        line = contents[i]
-        line = line.split()
-        t0 = float(line[0])                  #format is start end stepsize
-        t1 = float(line[1])
-        t2 = float(line[2])
-        count = (t1-t0)/t2
-        count -= 1
-        count = int(math.ceil(count))       ##find the total number of steps for the particular variable
-        value_count[i] = count
-
-    contents = contents[num_var:]            ## now contents contain the table entries
-    if contents[-1] == '':                   ## remove empty last element from the list
-        contents.pop()
-    initial_table_size = len(contents)      ## needed to compute the compression ratio
-    ## read each line and add to appropriate mode in the list of list (maps).
-    for i in range(len(contents)):
-        line = contents[i].split(":")       ## the input file format is minterm:mode for each entry, in a separate line
-        minterm = line[0]           
-        mode = int(line[1])
-        maps[mode].append(minterm)          ## add to list corresponding to the mode
-    fp.close()
-    return maps, num_var, value_count, initial_table_size   #return the mapped structure, the number of variables and the value count for each of them.
+## returns the codes of the combinations which are not present in the table for any mode, in ascending order.
+## raises ValueError if the number of combinations is more than limit, as the QMM would not be practical with so many don't cares.
+def table_gaps(maps, value_count, limit=1 << 20):
+    domain_size = 1
+    for count in value_count:
+        domain_size *= count + 1
+    if domain_size > limit:
+        raise ValueError("--dont-cares gaps: %d combinations of the variables, more than %d, use --dont-cares explicit"
+                         % (domain_size, limit))
+    present = bytearray(domain_size)
+    for codes in maps:
+        for code in codes:
+            present[code] = 1
+    return array.array('l', (code for code in xrange(domain_size) if not present[code]))
+
+## this function minimizes the minterms of one mode using the QMM method.
+## job is the tuple (minterm codes of the mode, number of variables, value count, cover method, time budget, node budget, cover jobs,
+## result cache, True to collect the statistics, don't care codes, prime method). the minterms are passed to QMM directly as integers, the jobs are independent so
+## that they can run in parallel. if the result cache is not None, the result is taken from it when present, and stored in it otherwise.
+## returns the implicants chosen by QMM (in the table format), True if the cover is proven optimal, True if it came from the cache
+## and the qm.QMStats of the minimization (None if the statistics are not collected, or the result came from the cache)
+def minimize_mode(job):
+    mapj, num_var, value_count, cover_method, time_budget, node_budget, cover_jobs, cache, collect_stats, dont_cares, prime_method = job
+    if cache is not None:
+        result = cache.get(value_count, mapj, dont_cares)
+        if result is not None:
+            return [qm.format_term(t) for t in result.cover], result.optimal, True, None
+    minterms = [qm.decode_minterm(code, value_count) for code in mapj]
+    dc_points = [qm.decode_minterm(code, value_count) for code in dont_cares]
+    stats = None
+    if collect_stats:
+        stats = qm.QMStats()
+    result = qm.minimize_minterms(num_var, value_count, minterms, cover_method, time_budget, node_budget, cover_jobs=cover_jobs,
+                                  stats=stats, dont_cares=dc_points, prime_method=prime_method)
+    if cache is not None:
+        cache.put(value_count, mapj, result, dont_cares)
+    return [qm.format_term(t) for t in result.cover], result.optimal, False, stats
 
 ## this function minimize the table using the QMM method
 ## the QM function present in another file is called here and the result is parsed to generate back the table
 ## the QM is invoked separately for all minterms of one mode and then repeated for each of the modes
-def minimize_using_qm(maps, out_file, num_var, value_count):
-    fout = open(out_file, "w+")         #file pointer to store the output
+## time_budget (seconds) is the budget for the complete table. each mode gets an equal share of the time left when it starts,
+## so that the time not used by the easy modes is available for the later ones. node_budget is the work budget for each mode.
+## jobs is the number of worker processes the modes are distributed to (0 for one per cpu). with more than one worker,
+## each mode gets a share of the time budget as per the number of workers. the results are written in the mode order.
+## cover_jobs is the number of worker processes for the cover search of the independent parts of the chart of a mode.
+## it is used only if the modes are minimized one at a time, as the workers of the modes can not have their own workers.
+## cache is the result_cache.ResultCache used to skip the modes minimized in an earlier run, or None to minimize all of them.
+## stats, if not None, is a dict which is filled with the qm.QMStats of each mode minimized (not of the ones from the cache).
+## dont_cares is the list of the codes of the don't care combinations, they are the don't cares of every mode.
+## if ordered is True, the output is an ordered list of rules, where the first matching rule gives the mode (see minimize_ordered).
+## prime_method is passed to qm.minimize_minterms.
+## returns the final table size, and True if the cover of every mode is proven optimal
+def minimize_using_qm(maps, out_file, num_var, value_count, cover_method="bnb", time_budget=None, node_budget=None, jobs=1,
+                      cover_jobs=1, cache=None, stats=None, dont_cares=(), ordered=False, prime_method="auto"):
     final_table_size = 0                ## used to store the final size, needed to compute the compression
+    all_optimal = True
+    if jobs == 0:
+        jobs = multiprocessing.cpu_count()
+    if cover_jobs == 0:
+        cover_jobs = multiprocessing.cpu_count()
+    modes = [j for j in range(len(maps)) if len(maps[j]) != 0]          ## QMM is invoked only for the modes with some minterms
+    results = {}
+
+    ## the don't cares of each mode. with the ordered rules, the minterms of the modes before it are don't cares as well
+    mode_dont_cares = dict((j, dont_cares) for j in modes)
+    if ordered:
+        modes = ordered_modes(maps)
+        earlier = list(dont_cares)
+        for j in modes:
+            mode_dont_cares[j] = earlier
+            earlier = earlier + list(maps[j])
+
+    if jobs > 1 and len(modes) > 1:
+        mode_budget = None
+        if time_budget is not None:
+            mode_budget = time_budget * min(1.0, float(jobs) / len(modes))
+        job_list = [(maps[j], num_var, value_count, cover_method, mode_budget, node_budget, 1, cache, stats is not None,
+                     mode_dont_cares[j], prime_method) for j in modes]
+        pool = multiprocessing.Pool(min(jobs, len(modes)))
+        try:
+            x_list = pool.map(minimize_mode, job_list)          ## the results come back in the order of the jobs
+        finally:
+            pool.close()
+            pool.join()
+        for j, x in zip(modes, x_list):
+            results[j] = x
+    else:
+        if time_budget is not None:
+            deadline = time.time() + time_budget
+        for k in range(len(modes)):          #run for each mode
+            j = modes[k]
+            mode_budget = None
+            if time_budget is not None:
+                mode_budget = max(0, deadline - time.time()) / (len(modes) - k)
+            ## now do the minimization. invoke QMM for each mode separately.
+            results[j] = minimize_mode((maps[j], num_var, value_count, cover_method, mode_budget, node_budget, cover_jobs, cache,
+                                        stats is not None, mode_dont_cares[j], prime_method))
+
+    fout = open(out_file, "w+")         #file pointer to store the output
+    cached = 0
+    rules = []
+    for j in modes:
+        x, optimal, from_cache, mode_stats = results[j]
+        if from_cache:
+            cached += 1
+        if mode_stats is not None:
+            stats[j] = mode_stats
+        if not optimal:
+            all_optimal = False
+            print "mode", j, ": cover not proven optimal within the budget"
+        if ordered:
+            rules.extend((qm.parse_term(t), j) for t in x)
+        x=append_mode(x,j)                      # update the output of QM with mode information
+        final_table_size += len(x)
+        ## write the minimized form to the output file
+        for entry in x:
+            fout.write(entry + "\n")            #add in the output file
+    fout.close()
+    if cache is not None:
+        print "modes found in the result cache:", cached, "of", len(modes)
+    if ordered:
+        differ = lookup_table.check_rules(rules, maps, value_count)
+        if differ:
+            raise RuntimeError("the ordered rules give a different mode for %d minterms of the table" % differ)
+        print "the ordered rules are checked to give the mode of every row of the table"
+    return final_table_size, all_optimal
+
+
+## the order of the modes in the ordered rules: the modes with fewer minterms first.
+## the rules of the small modes are the exceptions, matched first, so that the broad rules of the large modes can overlap them.
+def ordered_modes(maps):
+    return sorted([j for j in range(len(maps)) if len(maps[j]) != 0], key=lambda j: (len(maps[j]), j))
+
+## writes the statistics of the modes (a dict of mode to qm.QMStats) to a JSON file, along with their total for the table
+def write_stats(file_name, mode_stats, initial_table_size, final_table_size):
+    total = qm.QMStats()
+    for j in sorted(mode_stats):
+        total.merge(mode_stats[j])
+    table = total.to_dict()
+    table["initial_size"] = initial_table_size
+    table["final_size"] = final_table_size
+    fout = open(file_name, "w")
+    json.dump({"table": table, "modes": dict((str(j), mode_stats[j].to_dict()) for j in mode_stats)}, fout, indent=1, sort_keys=True)
+    fout.close()
+
+## minimizes one table file as per the command line arguments (args), and writes the minimized table to out_file.
+## jobs and cover_jobs are taken from args, unless given. mode_stats is passed to minimize_using_qm as stats.
+## if args.verify is True, the minimized table is verified against the table (see verify_table.py), and RuntimeError is raised
+## if they are not equivalent.
+## returns the initial table size, the final table size and True if the covers are proven optimal
+def minimize_file(in_file, out_file, args, cache, mode_stats=None, jobs=None, cover_jobs=None):
+    if jobs is None:
+        jobs = args.jobs
+    if cover_jobs is None:
+        cover_jobs = args.cover_jobs
+    ## convert the table to a local data structure named maps.
+    maps, num_var, value_count, initial_table_size, dont_cares = read_table.table_to_map(in_file, args.raw)
+    if args.dont_cares == "none":
+        dont_cares = []
+    elif args.dont_cares == "gaps":
+        dont_cares = table_gaps(maps, value_count)         ## includes the explicit don't cares
+        print "don't cares (combinations not present in the table):", len(dont_cares)
+
+    ## invoke the minimize function using the information parsed from the file.
+    final_table_size, all_optimal = minimize_using_qm(maps, out_file, num_var, value_count,
+                                                      args.cover_method, args.time_budget, args.node_budget, jobs,
+                                                      cover_jobs, cache, mode_stats, dont_cares, args.ordered,
+                                                      args.prime_method)
+    if args.verify:
+        rules = lookup_table.read_rules(out_file)
+        report = verify_table.verify_rules(rules, maps, value_count, args.ordered)
+        report.print_summary(rules)
+        if not report.ok():
+            raise RuntimeError("the minimized table is not equivalent to the input table")
+    return initial_table_size, final_table_size, all_optimal
+
+## the batch mode: the table files are taken from a directory (its *.txt files) or a glob pattern
+def batch_files(pattern):
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.txt")
+    files = glob.glob(pattern)
+    files.sort(key=lambda f: (os.path.dirname(f), len(f), f))     ## test_2 before test_10
+    return files
 
-    for j in range(len(maps)):          #run for each mode
-        mapj = maps[j]
-        fp = open("temp.txt", "w+")     #temporary file to pass arguments to the QMM function
-        fp.write(str(num_var)+"\n")
-        ## format as per expected format for QMM. Add value count for each variable in a space separated format.
-        for i in range(len(value_count)):
-            fp.write(str(value_count[i]) + " ")
-
-        fp.write("\n")
-        ## write each of the minterm from the table into the QMM in the expected format, minterms separated by space
-        for i in range(len(mapj)):
-            fp.write(mapj[i]+" ")
-        fp.close()                      #end of generation of input file for QM function
-
-        ## now do the minimization. invoke QMM for each mode separately.
-        if len(mapj) != 0:
-            x=qm.quine_mccluskey("temp.txt")        # invoke QM with the generated file as input
-            x=append_mode(x,j)                      # update the output of QM with mode information
-            final_table_size += len(x)
-            ## write the minimized form to the output file
-            for entry in x:
-                fout.write(entry + "\n")            #add in the output file
+## minimizes one table of the batch in a worker process. job is (input file, output file, args, cache).
+## the progress messages of the table are not printed. an error in the table is returned in the result instead of being raised,
+## so that it does not stop the other tables.
+## returns a dict with the file names, the initial and final size, the compression ratio, the time and the error (None if none)
+def batch_job(job):
+    in_file, out_file, args, cache = job
+    result = {"table": in_file, "output": out_file, "initial_size": None, "final_size": None, "compression": None,
+              "optimal": None, "time": None, "error": None}
+    start = time.time()
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    try:
+        initial_table_size, final_table_size, all_optimal = minimize_file(in_file, out_file, args, cache, jobs=1, cover_jobs=1)
+        result["initial_size"] = initial_table_size
+        result["final_size"] = final_table_size
+        result["optimal"] = all_optimal
+        if final_table_size > 0:
+            result["compression"] = float(initial_table_size) / final_table_size
+    except Exception as e:
+        result["error"] = "%s: %s" % (type(e).__name__, e)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    result["time"] = time.time() - start
+    return result
+
+## writes the summary of the batch (a list of the results of batch_job) as CSV, or as JSON if the file name ends with .json
+def write_summary(file_name, results):
+    fields = ["table", "output", "initial_size", "final_size", "compression", "optimal", "time", "error"]
+    fout = open(file_name, "wb")
+    if file_name.endswith(".json"):
+        json.dump(results, fout, indent=1, sort_keys=True)
+    else:
+        writer = csv.writer(fout)
+        writer.writerow(fields)
+        for result in results:
+            writer.writerow(["" if result[f] is None else result[f] for f in fields])
     fout.close()
-    os.system("rm temp.txt")
-    return final_table_size
+
+## minimizes all the tables of the batch (args.in_file is a directory or a glob pattern) into the directory args.out_file,
+## each output with the same file name as its input. the tables are distributed to a pool of args.jobs worker processes,
+## each table is minimized by one worker. a table which fails is reported in the summary, and the others are not affected.
+## the summary is written to args.summary (default: summary.csv in the output directory).
+## returns the exit status, 1 if any table failed
+def run_batch(args, cache):
+    files = batch_files(args.in_file)
+    if len(files) == 0:
+        print "no table files found for", args.in_file
+        return 1
+    out_dir = args.out_file
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    job_list = []
+    for f in files:
+        out_file = os.path.join(out_dir, os.path.basename(f))
+        if os.path.abspath(out_file) == os.path.abspath(f):
+            print "the output directory must not be the directory of the tables:", out_dir
+            return 1
+        job_list.append((f, out_file, args, cache))
+
+    jobs = args.jobs
+    if jobs == 0:
+        jobs = multiprocessing.cpu_count()
+    start = time.time()
+    results = []
+    pool = None
+    if jobs > 1 and len(job_list) > 1:
+        pool = multiprocessing.Pool(min(jobs, len(job_list)))
+        result_iter = pool.imap(batch_job, job_list)         ## the results come back in the order of the files
+    else:
+        result_iter = (batch_job(job) for job in job_list)
+    try:
+        for result in result_iter:
+            results.append(result)
+            if result["error"] is not None:
+                print "%s : failed, %s" % (result["table"], result["error"])
+            else:
+                print "%s : initial table size = %d final_table_size= %d (%.3f s)" % (result["table"], result["initial_size"],
+                                                                                    result["final_size"], result["time"])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    summary = args.summary
+    if summary is None:
+        summary = os.path.join(out_dir, "summary.csv")
+    write_summary(summary, results)
+    failed = [r for r in results if r["error"] is not None]
+    initial = sum(r["initial_size"] for r in results if r["error"] is None)
+    final = sum(r["final_size"] for r in results if r["error"] is None)
+    print "tables:", len(results), " failed:", len(failed), " initial size =", initial, " final size =", final, \
+          " time = %.2f s" % (time.time() - start)
+    print "summary written to", summary
+    if failed:
+        return 1
+    return 0
 
 ## the main function.
 ## reads the command line arguments and invokes the function to perform the required computations
 def main():
-    arguments = sys.argv[1:]
-    ## error out if wrong usage on the command line
-    if len(arguments) < 2:
-        print "\nError: the expected usage is:\n"
-        print "python minimize_table.py <input table file> <output file name>\n"
-        print "example: python minimize_table.py table_0.txt minimized.txt\n"
-        return
+    parser = argparse.ArgumentParser(description="Minimize the runtime controller table by merging adjacent rows",
+                                     epilog="example: python minimize_table.py table_0.txt minimized.txt")
+    parser.add_argument("in_file", help="input table file (with --batch, a directory or a glob pattern of the table files)")
+    parser.add_argument("out_file", help="output file name (with --batch, the output directory)")
+    parser.add_argument("--cover-method", choices=["bnb", "petrick", "zdd"], default="bnb",
+                        help="method to find the minimum cover of the prime implicant chart (default: bnb)")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="wall clock budget in seconds for the table. the best cover found within it is used.")
+    parser.add_argument("--node-budget", type=int, default=None,
+                        help="work budget (search nodes) for the cover search of each mode")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="number of worker processes to minimize the modes in parallel, 0 for one per cpu (default: 1)")
+    parser.add_argument("--cover-jobs", type=int, default=1,
+                        help="number of worker processes to search the independent parts of the chart of a mode in parallel, "
+                             "0 for one per cpu. used only with --jobs 1 (default: 1)")
+    parser.add_argument("--prime-method", choices=["auto", "merge", "dense", "boxes"], default="auto",
+                        help="method to find the prime implicants: merge the adjacent implicants, the bitmap operations "
+                             "(dense) for the small domains, or the maximal boxes found directly (boxes). auto tries dense if the "
+                             "bounding box of the minterms of a mode has at most %d points, and switches to boxes when dense "
+                             "takes more work than boxes would (default: auto)" % dense_primes.DENSE_LIMIT)
+    parser.add_argument("--cache-dir", default=os.path.join(os.path.expanduser("~"), ".cache", "qmm_mvl_adjacent"),
+                        help="directory of the persistent cache of the minimized modes, written on every run unless --no-cache is "
+                             "given (default: ~/.cache/qmm_mvl_adjacent)")
+    parser.add_argument("--cache-size", type=float, default=256,
+                        help="maximum size of the cache in MB, the least recently used entries are removed beyond it (default: 256)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="bypass the cache, all the modes are minimized and nothing is stored")
+    parser.add_argument("--dont-cares", choices=["none", "explicit", "gaps"], default="explicit",
+                        help="don't cares used in the minimization: the rows with the mode x in the table (explicit), those and "
+                             "every combination not present in the table (gaps), or none (default: explicit)")
+    parser.add_argument("--ordered", action="store_true",
+                        help="minimize the modes jointly into an ordered list of rules, where the first matching rule gives the mode")
+    parser.add_argument("--raw", action="store_true",
+                        help="the rows of the table have the raw values of the variables, which are converted to the steps "
+                             "of their ranges. the rows with the same steps are collapsed into one")
+    parser.add_argument("--verify", action="store_true",
+                        help="verify that the minimized table gives the mode of every row of the input table, and that the "
+                             "rows of different modes do not overlap on them (unless --ordered). the exit status is 1 if not")
+    parser.add_argument("--batch", action="store_true",
+                        help="minimize all the tables of a directory or glob pattern in one run, --jobs tables in parallel")
+    parser.add_argument("--summary", default=None, metavar="FILE",
+                        help="summary of the batch, CSV or JSON (if the name ends with .json) (default: OUT_DIR/summary.csv)")
+    parser.add_argument("--stats", default=None, metavar="FILE",
+                        help="write the statistics of the minimization (phase times and counters, for the table and for each mode) "
+                             "to this JSON file")
+    args = parser.parse_args()
+
     print "Runtime controller generation for CAES"
     print "Minimizing the tables to merge adjacent rows"
 
-    in_file = arguments[0]
-    out_file = arguments[1]
+    cache = None
+    if not args.no_cache:
+        cache = result_cache.ResultCache(args.cache_dir, int(args.cache_size * 1024 * 1024))
 
-    ## convert the table to a local data structure named maps.
-    maps, num_var, value_count, initial_table_size = table_to_map(in_file)
+    if args.batch:
+        if args.stats is not None:
+            parser.error("--stats is not supported with --batch")
+        return run_batch(args, cache)
 
-    ## invoke the minimize function using the information parsed from the file.
-    final_table_size = minimize_using_qm(maps, out_file, num_var, value_count)
+    in_file = args.in_file
+    out_file = args.out_file
+
+    mode_stats = None
+    if args.stats is not None:
+        mode_stats = {}
+
+    try:
+        initial_table_size, final_table_size, all_optimal = minimize_file(in_file, out_file, args, cache, mode_stats)
+    except (RuntimeError, ValueError, IOError) as e:
+        print "error:", e
+        return 1
+    if args.stats is not None:
+        write_stats(args.stats, mode_stats, initial_table_size, final_table_size)
 
     print "initial table size =", initial_table_size, "final_table_size=", final_table_size
+    if not all_optimal:
+        print "the minimized table is not proven optimal, the budget was exhausted"
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
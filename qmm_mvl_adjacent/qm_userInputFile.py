@@ -10,10 +10,13 @@ Last change : Sep 9, 2018
 Acknowledgement: Initial code borrowed from: JongHewk Park (https://github.com/jonghewk/Quine_McCluskey)
 
 Here is the algorithm
-1. Find the prime implicants
-2. Make Prime implicant chart
+1. Find the prime implicants (of the minterms and the don't cares, if any), which are the maximal boxes of the minterms.
+   They are found with the bitmap operations of dense_primes.py if the domain of the minterms is small, and directly
+   by box_primes.py otherwise (or by merging the adjacent implicants, as done originally)
+2. Make Prime implicant chart (the columns are the minterms only)
 3. Find essential prime implicants
-4. Use Petrick's Method to find all solutions
+4. Use Petrick's Method to find all solutions (on explicit lists of products, or on a ZDD with zdd_petrick.py),
+   or the branch and bound search of min_cover.py to find one of them
 
 This file was modified by Rajesh Kedia in August 2018 to extend the implementation to support
 any arbitrary number of variables, each in decimal number system with different number of values for 
@@ -26,8 +29,57 @@ import itertools
 import sys
 import logging
 import copy
+import time
+import min_cover
+import dense_primes
+import box_primes
+import zdd_petrick
+
+## implicants are held internally as a tuple of (lo, hi) integer pairs, one pair per variable.
+## a single value v is stored as (v, v), and a merged range lo-hi as (lo, hi). e.g. "0,1-3,2" is ((0,0),(1,3),(2,2)).
+## the comma separated string form is parsed only once when the minterms are read and is formatted back only for the output.
+def parse_term(s):
+    term = []
+    for field in s.split(","):
+        if '-' in field:    #merged range
+            t = field.split('-')
+            term.append((int(t[0]), int(t[1])))
+        else:               #single value, assign it to both ends of the interval
+            v = int(field)
+            term.append((v, v))
+    return tuple(term)
+
+
+## converts an implicant back to the comma separated string format used in the input and output tables
+def format_term(term):
+    fields = []
+    for lo, hi in term:
+        if lo == hi:
+            fields.append(str(lo))
+        else:
+            fields.append(str(lo) + '-' + str(hi))
+    return ",".join(fields)
+
+
+## a minterm can also be encoded as a single integer, its mixed radix number with the radix value_count[i]+1 for the variable i
+## (value_count[i] being the maximum value of the variable i). the first variable is the most significant one,
+## so that the codes are in the same order as the minterms in a lexicographically sorted table.
+def encode_minterm(minterm, value_count):
+    code = 0
+    for i in range(len(value_count)):
+        code = code * (int(value_count[i]) + 1) + int(minterm[i])
+    return code
+
+
+## converts a mixed radix code back to the minterm, a tuple of integers
+def decode_minterm(code, value_count):
+    minterm = [0] * len(value_count)
+    for i in range(len(value_count) - 1, -1, -1):
+        code, minterm[i] = divmod(code, int(value_count[i]) + 1)
+    return tuple(minterm)
+
 
-#compare two binary strings, check where there is one difference
+#compare two implicants, check where there is one difference
 #RK: updated the function to compare when the term contains merged range, and also to enable merging if merging is possible
 # this function returns True if there is a merging, along with the position of merging, along with the starting and ending value of the merged range
 def compareItems(s1,s2):
@@ -37,39 +89,24 @@ def compareItems(s1,s2):
         ## do nothing if the same portion within the minterm
         if (s1[i] != s2[i]):
             count+=1
-            ## check if already a merged range (presence of '-') in s1
-            if ('-' in s1[i]):  #extract 2 portion of the range for s1
-                t1 = s1[i].split('-')
-                t10 = int(t1[0])
-                t11 = int(t1[1])
-            else:               #if it is single value, assign it to both of the variables
-                t10 = int(s1[i])
-                t11 = int(s1[i])
-
-            ## check if already a merged range (presence of '-') in s1
-            if ('-' in s2[i]):  #extract 2 portion of the range for s2
-                t2 = s2[i].split('-')
-                t20 = int(t2[0])
-                t21 = int(t2[1])
-            else:
-                t20 = int(s2[i])
-                t21 = int(s2[i])
+            t10, t11 = s1[i]        #the two ends of the range for s1 (same value if not merged)
+            t20, t21 = s2[i]        #the two ends of the range for s2
 
             #if difference is 1, it means they are just single values. merge them to create a range for next group
             if (t20-t11 == 1 and t10==t11):
-                r1 = str(t11)
-                r2 = str(t20)
+                r1 = t11
+                r2 = t20
                 pos = i
 
             #if there is an overlap in the two ends, it means that there is a range being merged with another range.
             #using >= sign in the next check as 9-11 and 10-12 needs to be merged to 9-12
-            elif (t11 >= t20):    
-                r1 = str(t10)
-                r2 = str(t21)
+            elif (t11 >= t20):
+                r1 = t10
+                r2 = t21
                 pos = i
             elif (t21 >= t10):
-                r1 = str(t20)
-                r2 = str(t11)
+                r1 = t20
+                r2 = t11
                 pos = i
             else:
                 count+=1         ##increase count again if merging condition is not satisfied to create error (count=1 is only recognized valid)
@@ -79,85 +116,102 @@ def compareItems(s1,s2):
         return False, None, None, None
 
 
-#s1 should be the term
 #RK: updated the function to compare if a minterm is covered in the implicant or not
 def compBinarySame(implicant, minterm):
-    minterm = minterm.split(",")
-    implicant = implicant[0].split(",")
-    ## check that all portion are either same or covered within the implicant range
+    ## check that all portion are covered within the implicant range
     for i in range(len(implicant)):
-        if implicant[i] != minterm[i]:
-            if ('-' in implicant[i]):  #extract 2 portion of the range for term
-                t2 = implicant[i].split('-')
-                t20 = int(t2[0])
-                t21 = int(t2[1])
-                if not((int(minterm[i]) >= t20) and (int(minterm[i]) <= t21)):
-                    return False
-            else:
-                return False
+        lo, hi = implicant[i]
+        if not (lo <= minterm[i][0] <= hi):
+            return False
     return True         ## True indicates if the minterm is covered in the implicant
 
 
 #combine pairs and make new group
 #RK: updated the function to take the values returned by the compareItems function and use to create the new term.
 ## if the minterms are adjacent, then they are combined to make an implicant
-def combinePairs(group, unchecked):
+## the next group is indexed by "all coordinates except one" keys, so that an implicant is compared only with the ones
+## which share every other coordinate with it. the covered implicants are tracked in a set instead of a list.
+## if stats (a QMStats) is not None, the group sizes and the number of comparisons and merges of this round are recorded in it.
+def combinePairs(group, unchecked, stats=None):
     #define length
     l = len(group) -1
 
-    #check list
-    check_list = []
+    #set of implicants which are merged at least once (covered)
+    check_set = set()
 
     #create next group to store the merged ranges
     next_group = [[] for x in range(l)]
+    comparisons = 0
+    merges = 0
 
     #go through the groups
     for i in range(l):
+        if len(group[i]) == 0 or len(group[i+1]) == 0:
+            continue
+        index = index_by_other_coordinates(group[i+1])
+        merged = set()          ## the merged entries already present in next_group[i], to avoid the duplicates
         #first selected group
         for elem1 in group[i]:
-            #next selected group
-            elem1 = elem1.split(",")
-            for elem2 in group[i+1]:        ## compare with adjacent groups only
-                elem2 = elem2.split(",")
+            ## collect the candidates from the next group, only the ones sharing all coordinates other than one can merge
+            candidates = []
+            for pos in range(len(elem1)):
+                candidates.extend(index.get((pos, elem1[:pos] + elem1[pos+1:]), ()))
+            candidates.sort()       ## keep the order of the next group, so that the merged entries are created in the same order as before
+            comparisons += len(candidates)
+            for k, elem2 in candidates:        ## compare with adjacent groups only
                 b, pos, t1, t2 = compareItems(elem1, elem2)     ## get the comparison result from the function
                 if b == True:           ## if merging is possible
-                    #append the ones used in check list, so that they can be marked as covered
-                    check_list.append(",".join(elem1))
-                    check_list.append(",".join(elem2))
+                    merges += 1
+                    #add the ones used in check set, so that they can be marked as covered
+                    check_set.add(elem1)
+                    check_set.add(elem2)
                     #replace the different term with the values returned from the compareItems function
-                    new_elem = list(elem1)          ##merged entry
-                    new_elem[pos] = t1+'-'+t2
-                    new_elem = ",".join(new_elem)
-                    next_group[i].append(new_elem)      ## add to the new group
+                    new_elem = elem1[:pos] + ((t1, t2),) + elem1[pos+1:]         ##merged entry
+                    if new_elem not in merged:
+                        merged.add(new_elem)
+                        next_group[i].append(new_elem)      ## add to the new group
 
     # once all merging is done, keep the uncovered ones in the unchecked list as they are already Prime implicants
     for i in group:
         for j in i:
-            j = j.split()
-            if j[0] not in check_list:   ##using j[0] because j is a list of singleton string, we want to compare to string in the check_list
+            if j not in check_set:
                 unchecked.append(j)
+    if stats is not None:
+        stats.merge_rounds.append({"group_sizes": [len(i) for i in group], "comparisons": comparisons, "merges": merges,
+                                   "implicants": sum(len(i) for i in next_group)})
+        stats.count("comparisons", comparisons)
+        stats.count("merges", merges)
     return next_group, unchecked        # return the merged group and the unchecked list
 
 
+## index the implicants of a group by each of their "all coordinates except one" keys.
+## the key (pos, term without the coordinate pos) maps to the list of (position in group, implicant).
+def index_by_other_coordinates(group):
+    index = {}
+    for k in range(len(group)):
+        elem = group[k]
+        for pos in range(len(elem)):
+            index.setdefault((pos, elem[:pos] + elem[pos+1:]), []).append((k, elem))
+    return index
+
+
 #remove redundant lists in 2d list
-# it removes the duplicate entries from the group
+# it removes the duplicate entries from the group, keeping the first occurrence of each
 def remove_redundant(group):
     new_group = []
     for j in group:
-        new=[]
-        for i in j:
-            if i not in new:
-                new.append(i)
-        new_group.append(new)
+        new_group.append(remove_redundant_list(j))
     return new_group
 
 
 #remove redundant in 1d list
-# it removes the duplicate entries from the group
+# it removes the duplicate entries from the group, keeping the first occurrence of each
 def remove_redundant_list(list):
     new_list = []
+    seen = set()
     for i in list:
-        if i not in new_list:
+        if i not in seen:
+            seen.add(i)
             new_list.append(i)
     return new_list
 
@@ -178,28 +232,62 @@ def check_empty(group):
     return False
 
 
+## the PI chart is stored as one integer bitset for each prime implicant (row of the chart).
+## bit i of a row is set if the i-th minterm (column of the chart) is covered by the prime implicant.
+
+## make the PI chart for the given implicants (rows) and minterms (columns)
+## instead of testing each (minterm, implicant) pair, a bitset of the minterms is made for each value of each variable.
+## the minterms covered by an implicant are then the AND over the variables of the union of the bitsets within its range,
+## where the union over a range is the difference of two prefix unions.
+def build_chart(implicants, minterms):
+    if len(minterms) == 0:
+        return [0 for x in implicants]
+    n_var = len(minterms[0])
+    prefix = []             ## prefix[j][v] is the bitset of the minterms with value less than v for the variable j
+    for j in range(n_var):
+        positions = {}
+        for i in range(len(minterms)):
+            positions.setdefault(minterms[i][j][0], []).append(i)
+        max_value = max(max(positions), max(imp[j][1] for imp in implicants) if implicants else 0)
+        union = 0
+        prefix_j = [0]
+        for v in range(max_value + 1):
+            if v in positions:
+                union |= min_cover.bits_from_indices(positions[v], len(minterms))
+            prefix_j.append(union)
+        prefix.append(prefix_j)
+
+    Chart = []
+    for imp in implicants:
+        row = -1            ## all bits set
+        for j in range(n_var):
+            lo, hi = imp[j]
+            row &= prefix[j][hi+1] ^ prefix[j][lo]          ## minterms with value within lo..hi for the variable j
+            if row == 0:
+                break
+        Chart.append(row)
+    return Chart
+
 #find essential prime implicants from the PI chart ( col num of ones = 1)
+## the columns covered exactly once are found in bulk: 'once' accumulates the columns covered at least once, 'twice' the ones covered more than once.
 def find_prime(Chart):
+    once = 0
+    twice = 0
+    for row in Chart:
+        twice |= once & row
+        once |= row
+    single = once & ~twice          ## the columns with only one 1
     prime = []
-    for col in range(len(Chart[0])):
-        count = 0
-        pos = 0
-        for row in range(len(Chart)):
-            #find essential
-            if Chart[row][col] == 1:
-                count += 1
-                pos = row
-
-        if count == 1:
-            prime.append(pos)
+    for row in range(len(Chart)):
+        if Chart[row] & single:
+            prime.append(row)
     return prime
 
 # check if all the minterms are covered in the essential PI, then no need of covering
 def check_all_zero(Chart):
     for i in Chart:
-        for j in i:
-            if j != 0:
-                return False        ## return false if any one of the entry is non-zero in the chart
+        if i != 0:
+            return False        ## return false if any one of the row is non-zero in the chart
     return True
 
 #multiply two terms (ex. (p1 + p2)(p1+p4+p5) )..it returns the product
@@ -221,7 +309,6 @@ def multiplication(list1, list2):
 
     #perform multiplication if both are not empty
     else:
-        logging.debug("Entering petrick multiplication loop")
         # iterate for each element in the list
         for i in list1:
             for j in list2:
@@ -243,7 +330,6 @@ def multiplication(list1, list2):
         ## create a copy of the original list, as original list is modified in the below steps and causes issues in the iterations
         ## however, terms which are in different order but redundant are removed in the next operation not here. e.g. P1P0 and P0P1 are same, but not removed here.
         list_result_copy = copy.copy(list_result)
-        logging.debug(list_result_copy)
 
         # if X+XY is there, then remove XY. This operation is performed in below few lines
         for i1 in range(len(list_result_copy)):
@@ -264,16 +350,17 @@ def multiplication(list1, list2):
         return list_result      # return the multiplied list
 
 #petrick's method for finding the minimal cover
-def petrick_method(Chart):
+## if stats (a QMStats) is not None, the size of the product after each multiplication step is recorded in it.
+def petrick_method(Chart, stats=None):
     logging.debug("Entering petrick method")
     #initial P
+    columns = {}
+    for row in range(len(Chart)):
+        for col in min_cover.indices_from_bits(Chart[row]):
+            columns.setdefault(col, []).append([row])
     P = []
-    for col in range(len(Chart[0])):
-        p =[]
-        for row in range(len(Chart)):
-            if Chart[row][col] == 1:
-                p.append([row])
-        P.append(p)             ## the initial P is the individual polynomial terms for each of the column
+    for col in sorted(columns):
+        P.append(columns[col])             ## the initial P is the individual polynomial terms for each of the (non-empty) column
 
     logging.debug("printing P from petrick method")
     logging.debug(P)
@@ -281,14 +368,13 @@ def petrick_method(Chart):
     logging.debug("length of P array=%d" %len(P))
     ## iterate for each of the polynomial within P and perform multiplication
 
+    ## nothing is logged within this loop, the formatting of the products took a large part of its time.
+    ## the product sizes are recorded in stats instead.
     for l in range(len(P)-1):
-        logging.warn("Entering petrick multiplication method number: %d" %l)
-        logging.warn(P[l+1])
         ## keep on doing multiplication for each of the terms (using left associativity rule)
         P[l+1] = multiplication(P[l],P[l+1])
-        logging.warn("Size of P:%d" %len(P[l+1]))
-        logging.debug(P[l+1])
-        #aaa = raw_input("test")
+        if stats is not None:
+            stats.petrick_sizes.append(len(P[l+1]))
 
     logging.debug("Completed petrick multiplication method")
     
@@ -310,37 +396,71 @@ def petrick_method(Chart):
     logging.debug("returning from petrick")
     return final            ## returns list of valid solutions
 
-#chart = n*n list
-def find_minimum_cost(Chart, unchecked):
+#chart = list of row bitsets
+## cover_method selects how the remaining chart (after removing the essential primes) is covered:
+##   "bnb"     - branch and bound exact minimum cover (min_cover.py), the default
+##   "petrick" - Petrick's method, which multiplies out the complete sum of products
+##   "zdd"     - Petrick's method with the products held in a ZDD (zdd_petrick.py), it gives all the minimal solutions as well
+## time_budget (seconds) and node_budget (search nodes) limit the "bnb" search, the best cover found within the budget is returned then.
+## the essential primes are printed if verbose is True.
+## if all_solutions is True, all the minimal solutions are returned, otherwise the "bnb" search returns only one of them.
+## jobs is the number of worker processes for the "bnb" search of the independent parts (components) of the chart.
+## if stats (a QMStats) is not None, the time of the "essentials" and "covering" phases, the number of essential primes and the
+## size of the reduced chart are recorded in it.
+## returns the list of minimal solutions, and True if they are proven optimal
+def find_minimum_cost(Chart, unchecked, cover_method="bnb", time_budget=None, node_budget=None, verbose=True, all_solutions=False, jobs=1,
+                      stats=None):
+    phase_start = time.time()
+    if stats is not None:
+        chart_stats = {"rows": len(Chart), "columns": min_cover.popcount(chart_columns(Chart)),
+                       "entries": sum(min_cover.popcount(row) for row in Chart)}
+        stats.charts.append(chart_stats)
     P_final = []
+    optimal = True
     #essential_prime = list with terms with only one 1 (Essential Prime Implicants)
     essential_prime = find_prime(Chart)
     essential_prime = remove_redundant_list(essential_prime)            # remove duplicates
 
     #print out the essential primes
-    if len(essential_prime)>0:
+    if verbose and len(essential_prime)>0:
         s = "\nEssential Prime Implicants :\n"
         print s
         for i in range(len(unchecked)):
             for j in essential_prime:
                 if j == i:
-                    print unchecked[i]
+                    print format_term(unchecked[i])
 
     #modifiy the chart to exclude the minterms covered by the essential primes
-    for i in range(len(essential_prime)):
-        for col in range(len(Chart[0])):
-            if Chart[essential_prime[i]][col] == 1:
-                for row in range(len(Chart)):
-                    Chart[row][col] = 0
+    covered = 0
+    for i in essential_prime:
+        covered |= Chart[i]
+    for row in range(len(Chart)):
+        Chart[row] &= ~covered
 
     logging.debug("Successful until chart generation for essential primes removal")
 
+    ## reduce the remaining chart by the essential rows, and the column and row dominance (repeated until nothing changes)
+    ## the rows selected during the reduction are a part of every solution, same as the essential primes
+    ## the row dominance is not used if all the solutions are needed, as it removes some of them
+    costs = [cal_efficient(i) for i in unchecked]
+    reduced_essential, Chart = min_cover.reduce_chart(Chart, costs, row_dominance=not all_solutions)
+    if stats is not None:
+        stats.count("essentials", len(essential_prime))
+        stats.count("reduced_essentials", len(reduced_essential))
+        chart_stats["reduced_rows"] = len([row for row in Chart if row])
+        chart_stats["reduced_columns"] = min_cover.popcount(chart_columns(Chart))
+    essential_prime = essential_prime + reduced_essential
+    phase_start = add_phase_time(stats, "essentials", phase_start)
+
     #if all zero, no need for petrick method because all minterms are covered by essential primes
     if check_all_zero(Chart) == True:
-        P_final = [essential_prime]
-    else:
+        P_final = [list(essential_prime)]
+    elif cover_method == "petrick" or cover_method == "zdd":
         #petrick's method
-        P = petrick_method(Chart)           ## P is the set of all valid minimal solutions
+        if cover_method == "zdd":
+            P = zdd_petrick.petrick_zdd(Chart, stats)
+        else:
+            P = petrick_method(Chart, stats)    ## P is the set of all valid minimal solutions
 
         #find the one with minimum cost
         #see "Introduction to Logic Design" - Alan B.Marcovitz Example 4.6 pg 213
@@ -365,34 +485,305 @@ def find_minimum_cost(Chart, unchecked):
             if P_cost[i] == min(P_cost):
                 P_final.append(P[i])
 
-        #append essential prime implicants to the solution of Petrick's method
-        for i in P_final:
-            for j in essential_prime:
-                if j not in i:
-                    i.append(j)
+    else:
+        ## branch and bound search, it gives the minimal solution with the minimum cost directly
+        P_final, optimal = min_cover.minimum_cover(Chart, costs, all_solutions, time_budget, node_budget, jobs)
+
+    add_phase_time(stats, "covering", phase_start)
+
+    #append essential prime implicants to the minimal solution
+    for i in P_final:
+        for j in essential_prime:
+            if j not in i:
+                i.append(j)
+
+    return P_final, optimal
+
+## returns the bitset of the columns covered by any row of the chart
+def chart_columns(Chart):
+    columns = 0
+    for row in Chart:
+        columns |= row
+    return columns
+
+## adds the time elapsed since start to the given phase in stats (if it is not None), and returns the current time,
+## which is the start of the next phase
+def add_phase_time(stats, phase, start):
+    now = time.time()
+    if stats is not None:
+        stats.phase_times[phase] = stats.phase_times.get(phase, 0.0) + (now - start)
+    return now
+
+#calculate the cost of an implicant.
+## every implicant becomes one row of the minimized table, hence each of them has a unit cost in this context.
+#the number of literals is not relevant when we want to count the number of rows in the final table
+def cal_efficient(s):
+    return 1
+
+## the result of the minimization of one set of minterms
+class QMResult:
+    def __init__(self, primes, covers, optimal, minterms=None, dont_cares=None):
+        self.minterms = minterms    ## the minterms which were minimized, each a tuple of integers (None if not known)
+        self.dont_cares = dont_cares or []      ## the don't cares used in the minimization (other than the minterms)
+        self.primes = primes        ## all the prime implicants, each a tuple of (lo, hi) pairs, one pair for each variable
+        self.covers = covers        ## the minimal covers found (all of them if requested), each a list of prime implicants in the same order as in primes
+        self.cover = covers[0]      ## the prime implicants chosen in the minimal cover, i.e. the first of the covers
+        self.optimal = optimal      ## False if the cover search was stopped by the budget before the cover was proven optimal
+
+
+## the statistics of the QMM minimization, collected if an instance is passed as stats to minimize_minterms.
+## the instrumented code only checks that stats is not None (or counts in local variables), so that it costs nearly nothing
+## when no statistics are needed.
+class QMStats:
+    def __init__(self):
+        self.phase_times = {}       ## seconds spent in each phase: grouping, merging, chart, essentials, covering
+        self.counters = {}          ## totals: minterms, primes, comparisons, merges, essentials, reduced_essentials
+        self.merge_rounds = []      ## for each round of combinePairs: the group sizes, the comparisons and merges, the implicants made
+        self.charts = []            ## for each PI chart: the rows, columns and entries, and the rows and columns left after the reduction
+        self.petrick_sizes = []     ## the number of products after each multiplication step of Petrick's method
+
+    ## adds n to the counter name
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    ## adds the statistics of another minimization (e.g. of another mode) to this one
+    def merge(self, other):
+        for phase, t in other.phase_times.items():
+            self.phase_times[phase] = self.phase_times.get(phase, 0.0) + t
+        for name, n in other.counters.items():
+            self.count(name, n)
+        self.merge_rounds.extend(other.merge_rounds)
+        self.charts.extend(other.charts)
+        self.petrick_sizes.extend(other.petrick_sizes)
+
+    ## returns the statistics as a dict, e.g. to be written as JSON
+    def to_dict(self):
+        return {"phase_times": self.phase_times,
+                "counters": self.counters,
+                "merge_rounds": self.merge_rounds,
+                "charts": self.charts,
+                "petrick_sizes": self.petrick_sizes}
+
+
+## the in-memory entry point for the QMM minimization. It performs the QMM minimization of the given minterms.
+## n_var is the number of variables, value_count the maximum value of each variable (as in the value count line of the input file),
+## and minterms is a list of minterms, each a sequence of n_var integers.
+## dont_cares is an optional list of don't care points in the same form. they are merged along with the minterms, so that the
+## prime implicants can extend over them, but they are not columns of the PI chart, i.e. the cover need not include them.
+## the prime implicants made only of don't cares are dropped, and the result has only the don't cares within the bounding box
+## of the minterms.
+## cover_method is passed to find_minimum_cost
+## time_budget is the wall clock budget (seconds) for the complete minimization, node_budget is the work budget for the cover search.
+## when the budget runs out, the best cover found so far is returned instead of the minimum one.
+## if verbose is True, the prime implicants, essential primes and the answer are printed as well.
+## all_solutions and cover_jobs are passed to find_minimum_cost (as all_solutions and jobs)
+## prime_method is the method used to find the prime implicants: "merge" (merging the adjacent implicants with combinePairs),
+## "dense" (the bitmaps of dense_primes.py), "boxes" (the maximal boxes of box_primes.py), or "auto" which tries "dense" with a
+## work limit (see dense_primes.py) if the bounding box of the minterms has at most dense_primes.DENSE_LIMIT points, and uses
+## "boxes" otherwise or when the limit is reached.
+## all of them find the same prime implicants.
+## stats, if not None, is a QMStats in which the time spent in each phase ("grouping", "merging", "chart", "essentials" including
+## the reduction of the chart, and "covering") and the counters of the minimization are recorded.
+## raises ValueError if the minterms (or don't cares) do not match the number of variables or the value counts.
+## returns a QMResult
+def minimize_minterms(n_var, value_count, minterms, cover_method="bnb", time_budget=None, node_budget=None, verbose=False,
+                      all_solutions=False, cover_jobs=1, stats=None, dont_cares=None, prime_method="auto"):
+    start_time = time.time()
+    phase_start = start_time
+    if len(value_count) != n_var:
+        raise ValueError("Choose the correct number of entries in the value count")
+    totalsize = 0
+    for i in range(len(value_count)):
+        totalsize = totalsize + int(value_count[i])           ## find the total size of the number of groups. this is the sum of value count for each variable
 
-    return P_final
+    #make a group list
+    group = [[] for x in range(totalsize+1)]            ## create a list for each group in QMM separately
 
-#calculate the number of literals.
-#This function is not correct, but not used in this context. Hence not updated.
-#this is relevant when we want to count the number of terms in each implicant
-def cal_efficient(s):
-    count = 0
-    for i in range(len(s)):
-        if s[i] != '-':
-            count+=1
+    ## iterate for each minterm, and assign it a group
+    a = []
+    for i in range(len(minterms)):
+        #convert to the integer interval form
+        local_minterm = tuple((int(v), int(v)) for v in minterms[i])
+        a.append(local_minterm)
+        groupnum = 0
+        ##RK: modified the error checking condition and message updated accordingly
+        if len(local_minterm) != n_var:
+            raise ValueError("Choose the correct number of indices for the term number %d" % i)
+
+        for j in range(len(local_minterm)):
+            groupnum = groupnum + local_minterm[j][0]           ## find the sum of indices to determine the group number
+            if local_minterm[j][0] > int(value_count[j]):       ## check that the input is within the specified range
+                raise ValueError("Choose the correct value counts")
+        group[groupnum].append(local_minterm)                   ## append the minterm to the list of the corresponding group
+
+    ## the don't cares are assigned a group in the same way, except the ones which are minterms as well.
+    ## the ones outside the bounding box of the minterms are skipped: an implicant can be clipped to the bounding box and it still
+    ## covers the same minterms, hence they never reduce the size of the cover (they only make more implicants to merge).
+    dc_points = []
+    if dont_cares and a:
+        known = set(a)
+        low = [min(term[j][0] for term in a) for j in range(n_var)]
+        high = [max(term[j][0] for term in a) for j in range(n_var)]
+        for i in range(len(dont_cares)):
+            local_dc = tuple((int(v), int(v)) for v in dont_cares[i])
+            if len(local_dc) != n_var:
+                raise ValueError("Choose the correct number of indices for the don't care number %d" % i)
+            groupnum = 0
+            for j in range(len(local_dc)):
+                groupnum = groupnum + local_dc[j][0]
+                if local_dc[j][0] > int(value_count[j]):
+                    raise ValueError("Choose the correct value counts")
+            if local_dc in known or any(not low[j] <= local_dc[j][0] <= high[j] for j in range(n_var)):
+                continue
+            known.add(local_dc)
+            dc_points.append(tuple(lo for lo, hi in local_dc))
+            group[groupnum].append(local_dc)
+    phase_start = add_phase_time(stats, "grouping", phase_start)
+
+    points = [tuple(lo for lo, hi in term) for term in a]
+    dense_work = None
+    if prime_method == "auto":
+        prime_method = "boxes"
+        if points and dense_primes.box_size(points) <= dense_primes.DENSE_LIMIT:
+            prime_method = "dense"
+            dense_work = dense_primes.DENSE_WORK_PER_POINT * (len(points) + len(dc_points))
+
+    all_group=[]                ## contains the valid groups (non-empty) within the all_group.
+    unchecked = []
+    if prime_method == "dense":
+        ## the don't cares are inside the bounding box of the minterms, hence the bitmap covers them as well
+        unchecked = dense_primes.find_primes(points + dc_points, dense_work, dense_primes.DENSE_WORK_PER_PRIME)
+        if unchecked is None:
+            prime_method = "boxes"          ## the work limit of the automatic choice is reached
+    if prime_method == "boxes":
+        unchecked = box_primes.find_primes(points + dc_points)
+    elif prime_method == "merge":
+        #combine the pairs in series until nothing new can be combined
+        ##RK: no change to the toplevel functions, the internals of these function was changed
+
+        #this function iteratively calls the combinePairs function until there is no merging possible.
+        while check_empty(group) == False:
+            all_group.append(group)
+            next_group, unchecked = combinePairs(group,unchecked,stats)     ## unchecked contains all the final implicants
+            group = remove_redundant(next_group)
+    elif prime_method != "dense":
+        raise ValueError("Unknown prime method %s" % prime_method)
+    phase_start = add_phase_time(stats, "merging", phase_start)
+    if stats is not None:
+        stats.count("minterms", len(minterms))
+        stats.count("dont_cares", len(dc_points))
+        stats.count("primes", len(unchecked))
+
+    ##RK: updated to print the prime implicants, one in each line instead of in a single line
+    if verbose:
+        print "\nPrime Implicants :\n"
+        for i in unchecked:
+            print format_term(i)
+
+    if len(a) == 0:
+        return QMResult([], [[]], True, points, dc_points)
+
+    ## the step of creating the PI is over. Now, we create PI chart and process for minimal solution
+    #make the prime implicant chart, one bitset for each prime implicant
+    Chart = build_chart(unchecked, a)
+    if dc_points:
+        ## the prime implicants covering only don't cares (an empty row) are not needed
+        unchecked = [unchecked[i] for i in range(len(Chart)) if Chart[i]]
+        Chart = [row for row in Chart if row]
+    add_phase_time(stats, "chart", phase_start)
+
+    ## after creating the PI chart, invoke the minimization function which finds the essential primes and then invokes Petrick method for minimal cover
+    remaining = None
+    if time_budget is not None:
+        remaining = max(0, time_budget - (time.time() - start_time))        ## the time already spent in merging is not available for covering
+    primes, optimal = find_minimum_cost(Chart, unchecked, cover_method, remaining, node_budget, verbose, all_solutions, cover_jobs,
+                                        stats)
+    primes = remove_redundant(primes)
+
+    ## the first valid solution is the chosen one, the others are kept if all the solutions are needed
+    covers = []
+    for prime in primes:
+        chosen = set(prime)
+        cover = []
+        for i in range(len(unchecked)):
+            if i in chosen:
+                cover.append(unchecked[i])      ##this is the prime implicant which is chosen to be in the final answer
+        covers.append(cover)
+    return QMResult(unchecked, covers, optimal, points, dc_points)
+
+
+## the incremental interface to the QMM minimization. It updates a previous result of minimize_minterms after the minterms
+## in added are added to it and the ones in removed are removed from it (each a sequence of n_var integers).
+## the prime implicants never extend across the groups of adjacent minterms (the connected components, where two minterms are
+## adjacent if they differ by one in one variable), and the minimal cover is the union of the minimal covers of these groups.
+## hence only the groups which contain an added minterm, or a neighbour of a removed one, are minimized again.
+## the prime implicants and the cover of all the other groups are taken from the previous result as they are.
+## the other arguments are the same as for minimize_minterms. returns a QMResult.
+def update_minimization(previous, n_var, value_count, added, removed, cover_method="bnb", time_budget=None, node_budget=None,
+                        cover_jobs=1):
+    if previous.minterms is None:
+        raise ValueError("The previous result does not contain its minterms")
+    if previous.dont_cares:
+        raise ValueError("The previous result was minimized with don't cares, minimize it again instead")
+    previous_points = set(previous.minterms)
+    removed = set(tuple(int(v) for v in m) for m in removed)
+    added = set(tuple(int(v) for v in m) for m in added)
+    points = (previous_points - removed) | added
+    removed = removed - points          ## a minterm which is removed and added again is not changed
+
+    ## the seeds of the changed region are the added minterms and the remaining neighbours of the removed ones
+    seeds = list(added)
+    for m in removed:
+        for i in range(n_var):
+            for d in (-1, 1):
+                neighbour = m[:i] + (m[i] + d,) + m[i+1:]
+                if neighbour in points:
+                    seeds.append(neighbour)
+
+    ## the changed region is the set of minterms connected (by adjacency) to the seeds
+    region = set()
+    pending = [m for m in seeds if m in points]
+    while pending:
+        m = pending.pop()
+        if m in region:
+            continue
+        region.add(m)
+        for i in range(n_var):
+            for d in (-1, 1):
+                neighbour = m[:i] + (m[i] + d,) + m[i+1:]
+                if neighbour in points and neighbour not in region:
+                    pending.append(neighbour)
+
+    ## a prime implicant outside the region, not containing a removed minterm, is still a prime implicant.
+    ## it is entirely inside or outside of the region, hence it is enough to check one of its minterms.
+    def unchanged(term):
+        if tuple(lo for lo, hi in term) in region:
+            return False
+        for m in removed:
+            if compBinarySame(term, [(v, v) for v in m]):
+                return False
+        return True
 
-    return count
+    kept_primes = [term for term in previous.primes if unchanged(term)]
+    kept_cover = [term for term in previous.cover if unchanged(term)]
 
-#main function
-##RK: modified to take input from file
+    ## minimize the region again, in the order of the previous minterms and then the added ones
+    region_minterms = [point for point in previous.minterms if point in region]
+    region_minterms += sorted(point for point in added if point in region and point not in previous_points)
+    result = minimize_minterms(n_var, value_count, region_minterms, cover_method, time_budget, node_budget, cover_jobs=cover_jobs)
+
+    minterms = [point for point in previous.minterms if point in points] + sorted(added - previous_points)
+    return QMResult(kept_primes + result.primes, [kept_cover + result.cover], previous.optimal and result.optimal, minterms)
+
+
+## the file based interface to the QMM minimization, it is a wrapper around minimize_minterms
 ##format: first line is number of variables
 ##        second line contains value count for each
 ##        third line contains all the minterms in the required format
-## file name is specified as a command line argument by the invoker of the script
-
-## performs the QMM minimization of the minterms from the file.
-def quine_mccluskey(file_name):
+## cover_method, time_budget and node_budget are passed to minimize_minterms
+## if all_solutions is True, all the minimal solutions are printed, not only the chosen one
+## returns the chosen implicants (in the comma separated string format) and True if the cover is proven optimal
+def quine_mccluskey(file_name, cover_method="bnb", time_budget=None, node_budget=None, all_solutions=False):
     logging.basicConfig(stream=sys.stderr, level=logging.ERROR)
     logging.debug('A debug message!')
 
@@ -408,98 +799,51 @@ def quine_mccluskey(file_name):
     #get the num of variables (bits) as input
     n_var = int(file_contents[0])
     #get the size of each variable as input
-    sizes = file_contents[1]
-
-    s = sizes.split()           ## s contains the value count for each of the variable
-    totalsize = 0
-    if len(s) != n_var:
-        print '\nError : Choose the correct number of entries in the value count\n'
-        return
-    for i in range(len(s)):
-        totalsize = totalsize + int(s[i])           ## find the total size of the number of groups. this is the sum of value count for each variable
+    s = file_contents[1].split()           ## s contains the value count for each of the variable
 
     #get the minterms as input
     ##RK: modified to take minterms input in comma separated format
-    minterms = file_contents[2]                     ## specified in the input file, minterms separated by a space
-    a = minterms.split()         #split on white space. list a contains the minterms separately
-
-    #make a group list
-    group = [[] for x in range(totalsize+1)]            ## create a list for each group in QMM separately
-
-    ## iterate for each minterm, and assign it a group
-    for i in range(len(a)):
-        #convert to binary
-        local_minterm = a[i].split(",")
-        groupnum = 0
-        ##RK: modified the error checking condition and message updated accordingly
-        if len(local_minterm) != n_var:
-            print '\nError : Choose the correct number of indices for the term number %d\n' % i
-            return
-
-        for j in range(len(local_minterm)):
-            groupnum = groupnum + int(local_minterm[j])         ## find the sum of indices to determine the group number
-            if (int(local_minterm[j])) > (int(s[j])):           ## check that the input is within the specified range
-                print '\nError : Choose the correct value counts\n'
-                return
-        group[groupnum].append(a[i])                            ## append the minterm to the list of the corresponding group
-
-
-    all_group=[]                ## contains the valid groups (non-empty) within the all_group.
-    unchecked = []
-    #combine the pairs in series until nothing new can be combined
-    ##RK: no change to the toplevel functions, the internals of these function was changed
-
-    #this function iteratively calls the combinePairs function until there is no merging possible.
-    while check_empty(group) == False:
-        all_group.append(group)
-        next_group, unchecked = combinePairs(group,unchecked)           ## unchecked contains all the final implicants
-        group = remove_redundant(next_group)
-
-    ##RK: updated to print the prime implicants, one in each line instead of in a single line
-    s = "\nPrime Implicants :\n"
-    print s
-    for i in unchecked:
-        print i
-
-    ## the step of creating the PI is over. Now, we create PI chart and process for minimal solution
-    #make the prime implicant chart
-    Chart = [[0 for x in range(len(a))] for x in range(len(unchecked))]
-
-    ##RK: no change to the toplevel functions, the internals of these function was changed
-    for i in range(len(a)):
-        for j in range (len(unchecked)):
-            #term is same as number
-            if compBinarySame(unchecked[j], a[i]):
-               Chart[j][i] = 1
-
-    ## after creating the PI chart, invoke the minimization function which finds the essential primes and then invokes Petrick method for minimal cover
-    primes = find_minimum_cost(Chart, unchecked)
-    primes = remove_redundant(primes)
+    minterms = file_contents[2].split()     ## specified in the input file, minterms separated by a space
+    for i in range(len(minterms)):
+        minterms[i] = minterms[i].split(",")        ## the minterm strings are parsed only here
+
+    ## the optional fourth line has the don't cares, in the same format as the minterms
+    dont_cares = []
+    if len(file_contents) > 3:
+        dont_cares = [d.split(",") for d in file_contents[3].split()]
+
+    try:
+        result = minimize_minterms(n_var, s, minterms, cover_method, time_budget, node_budget, verbose=True, all_solutions=all_solutions,
+                                   dont_cares=dont_cares)
+    except ValueError as e:
+        print '\nError : %s\n' % e
+        return
 
     print "\n--  Answers --\n"
-
-##RK: this prints all possible optimal solutions. we are interested in only one solution, hence omitted for now.
-#    for prime in primes:
-#        s=''
-#        for i in range(len(unchecked)):
-#            for j in prime:
-#                if j == i:
-#                    print unchecked[i]      ##this is the prime implicant which is chosen to be in the final answer
-#                    #s= s+binary_to_letter(unchecked[i])+' + '
-#        print s[:(len(s)-3)]
-
     ##RK: this prints only the first valid solution
     ##RK: updated to print the prime implicants, one in each line instead of in a single line
     answer = []
-    for i in range(len(unchecked)):
-        for j in primes[0]:
-            if j == i:
-                print unchecked[i]      ##this is the prime implicant which is chosen to be in the final answer
-                answer.append(unchecked[i])
-    return answer
-
-
+    for i in result.cover:
+        print format_term(i)      ##this is the prime implicant which is chosen to be in the final answer
+        answer.append(format_term(i))      ## formatted back to the string form only for the output
+    if not result.optimal:
+        print "\nBudget exhausted: the cover is not proven optimal"
+
+    ## this prints all possible optimal solutions, if they are asked for
+    if all_solutions:
+        print "\n--  All minimal solutions (%d) --" % len(result.covers)
+        for cover in result.covers:
+            print
+            for i in cover:
+                print format_term(i)
+    return answer, result.optimal
+
+
+## usage: python qm_userInputFile.py <file> [bnb|petrick|zdd] [all]
 if __name__ == "__main__":
     arguments = sys.argv[1:]
     file_name = arguments[0]
-    quine_mccluskey(file_name)
+    cover_method = "bnb"
+    if len(arguments) > 1:
+        cover_method = arguments[1]
+    quine_mccluskey(file_name, cover_method, all_solutions="all" in arguments[2:])
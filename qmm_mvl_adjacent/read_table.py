@@ -0,0 +1,282 @@
+'''
+<Embedded System Design>
+This program reads the input table of minimize_table.py (the header with the number of variables, the number of modes and the
+range of each variable, then one minterm:mode row per line) into the lists of the minterm codes of each mode.
+It is used by minimize_table.py, lookup_table.py and verify_table.py.
+
+With raw values (minimize_table.py --raw), each value is converted to the index of its step within the range of the variable
+(start end stepsize) while the table is read, and the rows falling into the same steps are collapsed into one.
+
+'''
+
+import sys
+import math
+import array
+import bisect
+import itertools
+
+## the mode field of a don't care row in the input table, i.e. a combination for which any mode is acceptable
+DONT_CARE_MODES = ("x", "-")
+
+## this function converts the table entries into a map where we maintain list of minterms for each mode separately
+## the file is read line by line in a single pass, each row is validated and its minterm is stored in the list of its mode
+## as a mixed radix code (see qm.encode_minterm) instead of the raw string, so that very large tables fit in memory.
+## a row with the mode x (or -) is a don't care: any mode is acceptable for its minterm. it is stored in the list of don't cares
+## and not counted in the table size.
+## if raw is True, the values of the rows are the raw values of the variables (not their indices), see RawBuckets.
+## with raw, the duplicate rows (the same indices) are collapsed, only the first one is kept and counted in the table size.
+## the rows of a table of indices are kept as they are.
+## raises ValueError for a row which is not in the format minterm:mode, or has values out of the range, or (with raw) for the
+## rows with the same indices and different modes.
+## returns the map, the number of variables, the value count, the table size and the list of the don't care codes
+def table_to_map(file_name, raw=False):
+    fp = open(file_name, "r")
+    if fp.mode == "r":
+        print "file opened"
+
+    num_var = read_header_int(fp, 1, "the number of variables")
+    num_modes = read_header_int(fp, 2, "the number of modes")
+    value_count = [[] for x in range(num_var)]          ## based on specified min, max. and the step size, the number of distinct range is computed and assigned to value_count.
+    ranges = []
+    ## reading the variable settings and updating the value_count list with count for each of them.
+    for i in range(num_var):
+        line_num = i + 3
+        text = fp.readline().strip()
+        line = text.split()
+        if len(line) != 3:
+            raise ValueError("line %d: expected start end stepsize of the variable %d, found '%s'" % (line_num, i, text))
+        try:
+            t0 = float(line[0])                  #format is start end stepsize
+            t1 = float(line[1])
+            t2 = float(line[2])
+        except ValueError:
+            raise ValueError("line %d: the range of the variable %d is not numbers: '%s'" % (line_num, i, text))
+        if t2 <= 0 or t1 <= t0:
+            raise ValueError("line %d: the range of the variable %d is empty: '%s'" % (line_num, i, text))
+        count = (t1-t0)/t2
+        count -= 1
+        count = int(math.ceil(count))       ##find the total number of steps for the particular variable
+        value_count[i] = count
+        ranges.append((t0, t1, t2))
+
+    ## the map to store the minterms for each mode. It is a 2-D list, with an array of codes for each mode
+    ## (a plain list if the codes can be larger than what an array can hold).
+    domain_size = 1
+    for count in value_count:
+        domain_size *= count + 1
+    if domain_size <= sys.maxint:
+        maps = [array.array('l') for x in range(num_modes)]
+        dont_cares = array.array('l')
+    else:
+        maps = [[] for x in range(num_modes)]
+        dont_cares = []
+
+    radix = [count + 1 for count in value_count]
+    initial_table_size = 0      ## needed to compute the compression ratio
+    line_num = num_var + 2
+    if raw:
+        initial_table_size, dont_cares = read_raw_rows(fp, line_num, ranges, value_count, num_modes, maps, dont_cares)
+        fp.close()
+        return maps, num_var, value_count, initial_table_size, dont_cares
+
+    ## read each line and add to appropriate mode in the list of list (maps).
+    for line in fp:
+        line_num += 1
+        line = line.strip()
+        if line == '':                       ## skip the empty lines (e.g. at the end of the file)
+            continue
+        fields = line.split(":")       ## the input file format is minterm:mode for each entry, in a separate line
+        if len(fields) != 2:
+            raise ValueError("line %d: expected minterm:mode, found '%s'" % (line_num, line))
+        values = fields[0].split(",")
+        if len(values) != num_var:
+            raise ValueError("line %d: expected %d values in the minterm, found %d" % (line_num, num_var, len(values)))
+        mode = fields[1].strip()
+        if mode in DONT_CARE_MODES:
+            mode = None
+        else:
+            mode = int(mode)
+            if mode < 0 or mode >= num_modes:
+                raise ValueError("line %d: mode %d is out of the range 0 to %d" % (line_num, mode, num_modes - 1))
+        code = 0
+        for i in range(num_var):
+            v = int(values[i])
+            if v < 0 or v >= radix[i]:
+                raise ValueError("line %d: value %d of the variable %d is out of the range 0 to %d" % (line_num, v, i, value_count[i]))
+            code = code * radix[i] + v          ## same as qm.encode_minterm
+        if mode is None:
+            dont_cares.append(code)
+            continue
+        maps[mode].append(code)          ## add to list corresponding to the mode
+        initial_table_size += 1
+    fp.close()
+    #return the mapped structure, the number of variables and the value count for each of them.
+    return maps, num_var, value_count, initial_table_size, dont_cares
+
+
+## reads a line of the header of the table, which has a single positive integer (name is what it is, for the error message).
+## raises ValueError with the line number if it is not one
+def read_header_int(fp, line_num, name):
+    text = fp.readline().strip()
+    try:
+        value = int(text)
+    except ValueError:
+        raise ValueError("line %d: expected %s, found '%s'" % (line_num, name, text))
+    if value <= 0:
+        raise ValueError("line %d: %s must be positive, found %d" % (line_num, name, value))
+    return value
+
+## returns the mode of a row (the field after the ':'), None for a don't care.
+## raises ValueError if it is out of the range 0 to num_modes-1
+def parse_mode(field, line_num, num_modes):
+    mode = field.strip()
+    if mode in DONT_CARE_MODES:
+        return None
+    mode = int(mode)
+    if mode < 0 or mode >= num_modes:
+        raise ValueError("line %d: mode %d is out of the range 0 to %d" % (line_num, mode, num_modes - 1))
+    return mode
+
+## the number of lines of a raw table which are converted together
+RAW_BATCH = 1 << 16
+
+## reads the rows of a table with the raw values of the variables (the lines after the header, line_num being the line number
+## of the header's last line), and adds their codes to maps and dont_cares (as table_to_map does).
+## the lines are converted in batches: the values of each variable are converted for all the lines of the batch together,
+## a batch with an invalid line being converted again one line at a time to report the line (see raw_row).
+## the rows with the same codes are collapsed, a mode overriding a don't care.
+## raises ValueError for an invalid line, and for the rows with the same codes and different modes.
+## returns the table size (the number of distinct rows, other than the don't cares) and the don't cares
+def read_raw_rows(fp, line_num, ranges, value_count, num_modes, maps, dont_cares):
+    radix = [count + 1 for count in value_count]
+    buckets = [RawBuckets(t0, t1, t2, count) for (t0, t1, t2), count in zip(ranges, value_count)]
+    mode_memo = {}          ## the mode of each mode field, -1 for a don't care
+    seen = {}               ## the mode of each code read so far, None for a don't care
+    raw_rows = 0
+    initial_table_size = 0
+    while True:
+        lines = list(itertools.islice(fp, RAW_BATCH))
+        if not lines:
+            break
+        first_line = line_num + 1
+        line_num += len(lines)
+        rows = raw_batch(lines, buckets, radix, num_modes, mode_memo)
+        if rows is None:
+            ## convert the lines one at a time, the invalid line raises ValueError with its line number
+            rows = [raw_row(lines[k], first_line + k, buckets, ranges, radix, num_modes) for k in range(len(lines))]
+            rows = [row for row in rows if row is not None]
+        raw_rows += len(rows)
+        for code, mode in rows:
+            ## collapse the rows with the same codes
+            if code in seen:
+                previous = seen[code]
+                if previous == mode or mode is None:
+                    continue
+                if previous is not None:
+                    k = [raw_row(line, 0, buckets, ranges, radix, num_modes) for line in lines].index((code, mode))
+                    raise ValueError("line %d: the values fall into the same steps as a row of the mode %d, but have the mode %d" %
+                                     (first_line + k, previous, mode))
+            seen[code] = mode
+            if mode is None:
+                dont_cares.append(code)
+            else:
+                maps[mode].append(code)
+                initial_table_size += 1
+    ## the don't cares which got a mode in a later row
+    kept = [code for code in dont_cares if seen.get(code, None) is None]
+    if isinstance(dont_cares, array.array):
+        dont_cares = array.array('l', kept)
+    else:
+        dont_cares = kept
+    print "raw rows:", raw_rows, " distinct rows:", initial_table_size + len(dont_cares)
+    return initial_table_size, dont_cares
+
+## converts a batch of lines of a raw table into the list of their (code, mode), one variable at a time for all the lines.
+## the empty lines are skipped. mode_memo is the dict of the mode of each mode field (-1 for a don't care).
+## returns None if a line of the batch is invalid
+def raw_batch(lines, buckets, radix, num_modes, mode_memo):
+    num_var = len(radix)
+    fields = [line.split(":") for line in lines if line.strip()]
+    if set(map(len, fields)) != set([2]):
+        return None
+    values = [f[0].split(",") for f in fields]
+    if set(map(len, values)) != set([num_var]):
+        return None
+    texts = [f[1] for f in fields]
+    modes = map(mode_memo.get, texts)
+    if None in modes:
+        for text in set(texts):
+            if text not in mode_memo:
+                try:
+                    mode = parse_mode(text, 0, num_modes)
+                except ValueError:
+                    return None
+                if mode is None:
+                    mode = -1
+                mode_memo[text] = mode
+        modes = map(mode_memo.get, texts)
+    codes = [0] * len(values)
+    for i in range(num_var):
+        column = [v[i] for v in values]
+        index = map(buckets[i].memo.get, column)
+        if None in index:
+            for k in range(len(index)):
+                if index[k] is None:
+                    try:
+                        index[k] = buckets[i].index(column[k])
+                    except ValueError:
+                        return None
+                    if index[k] is None:
+                        return None
+        r = radix[i]
+        codes = [c * r + v for c, v in zip(codes, index)]
+    return zip(codes, [m if m >= 0 else None for m in modes])
+
+## converts one line of a raw table into its (code, mode), None for an empty line. raises ValueError if it is invalid
+def raw_row(line, line_num, buckets, ranges, radix, num_modes):
+    line = line.strip()
+    if line == '':
+        return None
+    fields = line.split(":")
+    if len(fields) != 2:
+        raise ValueError("line %d: expected minterm:mode, found '%s'" % (line_num, line))
+    values = fields[0].split(",")
+    if len(values) != len(radix):
+        raise ValueError("line %d: expected %d values in the minterm, found %d" % (line_num, len(radix), len(values)))
+    mode = parse_mode(fields[1], line_num, num_modes)
+    code = 0
+    for i in range(len(radix)):
+        try:
+            v = buckets[i].index(values[i])
+        except ValueError:
+            raise ValueError("line %d: value '%s' of the variable %d is not a number" % (line_num, values[i].strip(), i))
+        if v is None:
+            raise ValueError("line %d: value %s of the variable %d is out of the range %g to %g" %
+                             (line_num, values[i].strip(), i, ranges[i][0], ranges[i][1]))
+        code = code * radix[i] + v
+    return code, mode
+
+## class to convert the raw values of a variable into the indices of their steps. the range start end stepsize has the
+## steps start + k*stepsize to start + (k+1)*stepsize for k = 0 to count (the value count), the last one ending at end.
+## the index of a value is found by a binary search over the edges of the steps, and the index of each distinct value
+## (as it is written in the table) is remembered, as the raw traces repeat the same values many times.
+class RawBuckets:
+    def __init__(self, start, end, step, count, memo_limit=1 << 16):
+        self.start = start
+        self.end = end
+        self.edges = [start + k * step for k in range(1, count + 1)]        ## the lower edges of the steps after the first
+        self.memo = {}
+        self.memo_limit = memo_limit
+
+    ## returns the index of the value (the string of a number), or None if it is out of the range
+    def index(self, text):
+        v = self.memo.get(text)
+        if v is not None:
+            return v
+        x = float(text)
+        if x < self.start or x > self.end:
+            return None
+        v = bisect.bisect_right(self.edges, x)
+        if len(self.memo) < self.memo_limit:
+            self.memo[text] = v
+        return v
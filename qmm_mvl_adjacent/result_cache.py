@@ -0,0 +1,136 @@
+'''
+<Embedded System Design>
+This program implements a persistent cache of the QMM minimization results, so that the modes which have not changed since
+the previous run of minimize_table.py are not minimized again.
+
+Each entry is keyed by a hash of the value count and the sorted (distinct) minterm codes of one mode (and of the don't care
+codes, if any), and stores the prime
+implicants and the chosen cover as a JSON file named <key>.json in the cache directory.
+Only the results which are proven optimal are stored, as the ones limited by a budget may improve in a later run.
+The total size of the cache directory is bounded: when it grows larger, the least recently used entries are removed.
+The modification time of an entry is updated whenever it is used, and it is the time used for the eviction.
+The directory is not listed on every put: each process keeps an estimate of its total size, the size found by the last
+listing plus the entries it wrote since, and lists the directory again only when the estimate passes the limit, or after
+EVICT_INTERVAL puts (as the other processes also write entries). The eviction leaves the cache at 9/10 of the limit.
+
+'''
+
+import os
+import json
+import hashlib
+import tempfile
+import qm_userInputFile as qm
+
+CACHE_VERSION = 1           ## part of the key, to be changed whenever the format of the entries or the results change
+EVICT_INTERVAL = 64         ## the largest number of puts of a process between two listings of the directory
+
+## the estimated total size of each cache directory in this process, and the number of puts since it was listed.
+## kept in the module rather than in ResultCache, as a copy of the ResultCache is sent with every job to the worker processes
+_estimates = {}
+
+
+## class to contain the cache settings. it is passed to the worker processes along with the minimization jobs.
+class ResultCache:
+    def __init__(self, directory, max_bytes=256*1024*1024):
+        self.directory = directory      ## directory where the entries are stored, created if needed
+        self.max_bytes = max_bytes      ## maximum total size of the entries
+
+    ## canonical hash of the value count and the minterm codes of one mode, and the don't care codes.
+    ## the don't cares are hashed only if there are some, so that the keys without them are the same as before.
+    def key(self, value_count, codes, dont_cares=()):
+        h = hashlib.sha1()
+        h.update("qmm-v%d|%s|" % (CACHE_VERSION, ",".join(str(int(v)) for v in value_count)))
+        codes = sorted(set(codes))
+        for k in range(0, len(codes), 4096):
+            h.update(",".join(str(c) for c in codes[k:k+4096]) + ",")
+        if len(dont_cares) > 0:
+            h.update("|dc|")
+            dont_cares = sorted(set(dont_cares))
+            for k in range(0, len(dont_cares), 4096):
+                h.update(",".join(str(c) for c in dont_cares[k:k+4096]) + ",")
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    ## returns the QMResult stored for the given value count, minterm codes and don't care codes, or None if it is not in the cache
+    def get(self, value_count, codes, dont_cares=()):
+        name = self.path(self.key(value_count, codes, dont_cares))
+        try:
+            fp = open(name, "r")
+        except IOError:
+            return None
+        try:
+            entry = json.load(fp)
+        except ValueError:          ## a damaged entry is treated as not present
+            return None
+        finally:
+            fp.close()
+        try:
+            os.utime(name, None)        ## mark as recently used
+        except OSError:
+            pass
+        primes = [tuple(tuple(pair) for pair in p) for p in entry["primes"]]
+        cover = [tuple(tuple(pair) for pair in p) for p in entry["cover"]]
+        return qm.QMResult(primes, [cover], True)
+
+    ## stores the QMResult for the given value count, minterm codes and don't care codes, if it is proven optimal
+    ## the entry is written to a temporary file and renamed, so that parallel jobs never see a partial entry
+    def put(self, value_count, codes, result, dont_cares=()):
+        if not result.optimal:
+            return
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                if not os.path.isdir(self.directory):
+                    raise
+        entry = {"primes": result.primes, "cover": result.cover}
+        fd, temp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        fp = os.fdopen(fd, "w")
+        json.dump(entry, fp, separators=(",", ":"))
+        size = fp.tell()
+        fp.close()
+        os.rename(temp_name, self.path(self.key(value_count, codes, dont_cares)))
+        total, puts = _estimates.get(self.directory, (None, 0))
+        if total is None or total + size > self.max_bytes or puts + 1 >= EVICT_INTERVAL:
+            _estimates[self.directory] = (self.evict(), 0)
+        else:
+            _estimates[self.directory] = (total + size, puts + 1)
+
+    ## removes the least recently used entries until the total size is within max_bytes, and then down to 9/10 of it, so that
+    ## the next puts have room before the directory is listed again.
+    ## returns the total size of the entries left
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:         ## removed by another job meanwhile
+                continue
+            entries.append((st.st_mtime, name, st.st_size))
+            total += st.st_size
+        entries.sort()
+        if total <= self.max_bytes:
+            return total
+        for mtime, name, size in entries:
+            if total <= self.max_bytes * 9 // 10:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+        return total
+
+    ## removes all the entries
+    def clear(self):
+        _estimates.pop(self.directory, None)
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(".json") or name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,159 @@
+'''
+<Embedded System Design>
+This program verifies that a minimized runtime controller table (the output of minimize_table.py) gives the same mode as the
+original table (the input of minimize_table.py) for every context of the original table.
+
+The contexts of the original table are looked up in the minimized table compiled by lookup_table.py (the direct lookup array,
+indexed by the mixed radix code of the context which the contexts already have, or the decision tree for the larger domains),
+instead of testing every row against every context. The contexts with the mode x (don't cares) are not checked.
+
+The errors reported are:
+1. uncovered contexts: the contexts which no row of the minimized table contains
+2. misassigned contexts: the contexts for which the first row containing them has another mode
+3. conflicts (only for the unordered tables, where the rows can be matched in any order): the rows of different modes which
+   both contain a context of the original table. The decision tree is then built with all the rows containing a context at
+   its leaf (instead of the mode of the first one), so that the conflicts are found by the same lookups.
+The overlaps of the rows of different modes outside the contexts of the table are not errors, and are not looked for.
+
+usage:
+python verify_table.py <original table> <minimized table> [--ordered]
+
+example:
+python verify_table.py ../examples/test_0.txt out.txt
+'''
+
+import sys
+import argparse
+import qm_userInputFile as qm
+import read_table
+import lookup_table
+
+
+## the result of the verification of a minimized table
+class VerifyReport:
+    def __init__(self):
+        self.contexts = 0           ## the number of contexts checked
+        self.uncovered = []         ## the contexts matched by no row, each (context, expected mode)
+        self.misassigned = []       ## the contexts matched by a row of another mode, each (context, expected mode, mode found)
+        self.conflicts = []         ## the pairs of rows (their indexes) of different modes which contain the same context of the table,
+                                    ## the first row containing the context and a later one
+        self.mode_errors = {}       ## the number of contexts of each mode which are uncovered or misassigned
+
+    ## True if the minimized table is equivalent to the original one
+    def ok(self):
+        return not self.uncovered and not self.misassigned and not self.conflicts
+
+    ## prints the summary of the verification, and the first few errors of each kind
+    def print_summary(self, rules, limit=5):
+        print "verified", self.contexts, "contexts:", len(self.uncovered), "uncovered,", len(self.misassigned), "misassigned,", \
+              len(self.conflicts), "conflicting pairs of rows"
+        for mode in sorted(self.mode_errors):
+            print "  mode", mode, ":", self.mode_errors[mode], "contexts wrong"
+        for context, expected in self.uncovered[:limit]:
+            print "  uncovered:", format_context(context), "mode", expected
+        for context, expected, found in self.misassigned[:limit]:
+            print "  misassigned:", format_context(context), "mode", expected, "found", found
+        for i, j in self.conflicts[:limit]:
+            print "  conflict: rows", i + 1, "(%s:%d)" % (qm.format_term(rules[i][0]), rules[i][1]), "and", j + 1, \
+                  "(%s:%d)" % (qm.format_term(rules[j][0]), rules[j][1])
+
+
+## the context in the table format (comma separated values)
+def format_context(context):
+    return ",".join(str(v) for v in context)
+
+
+## verifies the rules (a list of (implicant, mode), see lookup_table.read_rules) against the map of the original table
+## (the minterm codes of each mode, see read_table.table_to_map).
+## if ordered is True, the first row containing a context gives its mode, and the overlaps are allowed. otherwise the rows
+## of different modes must not overlap on a context of the table, and the mode of a context is checked against its first row.
+## returns a VerifyReport
+def verify_rules(rules, maps, value_count, ordered=False):
+    report = VerifyReport()
+    value_count = [int(v) for v in value_count]
+
+    def wrong(code, expected, found):
+        context = qm.decode_minterm(code, value_count)
+        if found is None:
+            report.uncovered.append((context, expected))
+        else:
+            report.misassigned.append((context, expected, found))
+        report.mode_errors[expected] = report.mode_errors.get(expected, 0) + 1
+
+    report.contexts = sum(len(codes) for codes in maps)
+    if len(rules) == 0:
+        for mode in range(len(maps)):
+            for code in maps[mode]:
+                wrong(code, mode, None)
+        return report
+
+    if not ordered:
+        ## the lookup gives all the rows containing the context, the first one gives its mode
+        compiled = lookup_table.LookupTable(rules, value_count, all_rows=True)
+        lookup_one = compiled.lookup_one
+        conflicts = set()
+        for mode in range(len(maps)):
+            for code in maps[mode]:
+                rows = lookup_one(qm.decode_minterm(code, value_count))
+                if rows is None:
+                    wrong(code, mode, None)
+                    continue
+                first = rules[rows[0]][1]
+                if first != mode:
+                    wrong(code, mode, first)
+                for r in rows[1:]:
+                    if rules[r][1] != first:
+                        conflicts.add((rows[0], r))
+        report.conflicts = sorted(conflicts)
+        return report
+
+    compiled = lookup_table.LookupTable(rules, value_count)
+    if compiled.dense:
+        ## the index of the lookup array is the code of the context, as the value counts are the same
+        table = compiled.array
+        for mode in range(len(maps)):
+            for code in maps[mode]:
+                found = table[code]
+                if found != mode:
+                    wrong(code, mode, found if found >= 0 else None)
+    else:
+        lookup_one = compiled.lookup_one
+        for mode in range(len(maps)):
+            for code in maps[mode]:
+                found = lookup_one(qm.decode_minterm(code, value_count))
+                if found != mode:
+                    wrong(code, mode, found)
+    return report
+
+
+## verifies the minimized table in the file against the original table in the file.
+## returns the VerifyReport and the rules of the minimized table
+def verify_files(original_file, minimized_file, ordered=False):
+    maps, num_var, value_count, initial_table_size, dont_cares = read_table.table_to_map(original_file)
+    rules = lookup_table.read_rules(minimized_file)
+    return verify_rules(rules, maps, value_count, ordered), rules
+
+
+## the main function.
+## verifies the minimized table against the original table, the exit status is 1 if they are not equivalent
+def main():
+    parser = argparse.ArgumentParser(description="Verify that a minimized controller table gives the mode of every context "
+                                                 "of the original table",
+                                     epilog="example: python verify_table.py ../examples/test_0.txt out.txt")
+    parser.add_argument("original", help="original table (the input of minimize_table.py)")
+    parser.add_argument("minimized", help="minimized table (the output of minimize_table.py)")
+    parser.add_argument("--ordered", action="store_true",
+                        help="the minimized table is an ordered list of rules (minimize_table.py --ordered), the overlaps "
+                             "of the rows are allowed")
+    args = parser.parse_args()
+
+    report, rules = verify_files(args.original, args.minimized, args.ordered)
+    report.print_summary(rules)
+    if not report.ok():
+        print "error: the minimized table is not equivalent to the original table"
+        return 1
+    print "the minimized table is equivalent to the original table"
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
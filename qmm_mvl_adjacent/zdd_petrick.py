@@ -0,0 +1,241 @@
+'''
+<Logic Design>
+This program implements Petrick's method with a zero-suppressed decision diagram (ZDD). It is used by qm_userInputFile.py
+for the cover method "zdd", in place of petrick_method, which multiplies out the products as explicit lists of rows.
+
+A ZDD represents a family of sets of rows (here, the products of Petrick's method). Each node has a row (the variable),
+a low child (the sets without the row) and a high child (the sets with the row, the row being removed), and the nodes are
+shared between all the families, so that the families with many similar sets take a small space.
+The terminal 0 is the empty family, and the terminal 1 is the family having only the empty set.
+The rows are ordered by their index, a node being always above the nodes of the larger rows.
+
+Here is the algorithm
+1. Start with the family {{}} (the terminal 1).
+2. For each column, multiply the family by the sum of the rows covering the column (add each of these rows to each set,
+   and take the union), and remove the sets which contain another set of the family (absorption, X + XY = X).
+3. The family is then the set of all the irredundant covers. The covers with the fewest rows are extracted as a ZDD as well,
+   and listed.
+Every step is an operation on the ZDD, memoized on the nodes, so that its time depends on the number of nodes and not on the
+number of products.
+
+'''
+
+import sys
+import min_cover
+
+
+## class to contain the nodes of the ZDDs and the operations on them. a ZDD is the integer id of its root node,
+## 0 and 1 being the terminals. the nodes are (row, low, high), the same node is never made twice.
+class ZDD:
+    def __init__(self):
+        self.row = [None, None]          ## the row of each node, None for the terminals
+        self.low = [None, None]
+        self.high = [None, None]
+        self.unique = {}                ## (row, low, high) to the node id
+        self.cache = {}                 ## the results of the operations, (operation, arguments) to the node id
+
+    ## returns the node (row, low, high), a node whose high child is 0 is its low child (the zero suppression rule)
+    def node(self, row, low, high):
+        if high == 0:
+            return low
+        key = (row, low, high)
+        n = self.unique.get(key)
+        if n is None:
+            n = len(self.row)
+            self.row.append(row)
+            self.low.append(low)
+            self.high.append(high)
+            self.unique[key] = n
+        return n
+
+    ## the row of the top node, larger than every row for the terminals
+    def top(self, f):
+        if f < 2:
+            return sys.maxint
+        return self.row[f]
+
+    ## the union of two families
+    def union(self, f, g):
+        if f == 0 or f == g:
+            return g
+        if g == 0:
+            return f
+        if f > g:
+            f, g = g, f
+        key = ("union", f, g)
+        r = self.cache.get(key)
+        if r is not None:
+            return r
+        tf = self.top(f)
+        tg = self.top(g)
+        if tf < tg:
+            r = self.node(tf, self.union(self.low[f], g), self.high[f])
+        elif tg < tf:
+            r = self.node(tg, self.union(f, self.low[g]), self.high[g])
+        else:
+            r = self.node(tf, self.union(self.low[f], self.low[g]), self.union(self.high[f], self.high[g]))
+        self.cache[key] = r
+        return r
+
+    ## the family made by adding the row to every set of the family f
+    def add_row(self, f, row):
+        if f == 0:
+            return 0
+        key = ("add", f, row)
+        r = self.cache.get(key)
+        if r is not None:
+            return r
+        t = self.top(f)
+        if row < t:
+            r = self.node(row, 0, f)
+        elif row == t:
+            r = self.node(row, 0, self.union(self.low[f], self.high[f]))
+        else:
+            r = self.node(t, self.add_row(self.low[f], row), self.add_row(self.high[f], row))
+        self.cache[key] = r
+        return r
+
+    ## True if the family f has the empty set
+    def has_empty(self, f):
+        while f >= 2:
+            f = self.low[f]
+        return f == 1
+
+    ## the sets of the family f which contain no set of the family g
+    def non_supersets(self, f, g):
+        if g == 0 or f == 0:
+            return f
+        if f == g or self.has_empty(g):
+            return 0
+        if f == 1:
+            return 1            ## g has no empty set, hence no subset of the empty set
+        key = ("nonsup", f, g)
+        r = self.cache.get(key)
+        if r is not None:
+            return r
+        tf = self.top(f)
+        tg = self.top(g)
+        if tg < tf:
+            ## the sets of g with the row tg are not contained in any set of f
+            r = self.non_supersets(f, self.low[g])
+        elif tf < tg:
+            r = self.node(tf, self.non_supersets(self.low[f], g), self.non_supersets(self.high[f], g))
+        else:
+            high = self.non_supersets(self.non_supersets(self.high[f], self.low[g]), self.high[g])
+            r = self.node(tf, self.non_supersets(self.low[f], self.low[g]), high)
+        self.cache[key] = r
+        return r
+
+    ## the minimal sets of the family f, i.e. without the sets containing another set of f
+    def minimal(self, f):
+        if f < 2:
+            return f
+        key = ("minimal", f)
+        r = self.cache.get(key)
+        if r is not None:
+            return r
+        low = self.minimal(self.low[f])
+        high = self.non_supersets(self.minimal(self.high[f]), low)
+        r = self.node(self.row[f], low, high)
+        self.cache[key] = r
+        return r
+
+    ## the product of the family f and the sum of the rows (each row is a set of one row), with the absorption
+    def multiply(self, f, rows):
+        product = 0
+        for row in rows:
+            product = self.union(product, self.add_row(f, row))
+        return self.minimal(product)
+
+    ## the smallest number of rows in a set of the family f (None if f is empty), memo is the dict of the nodes done
+    def min_size(self, f, memo):
+        if f < 2:
+            if f == 1:
+                return 0
+            return None
+        if f in memo:
+            return memo[f]
+        low = self.min_size(self.low[f], memo)
+        high = self.min_size(self.high[f], memo)
+        if high is not None:
+            high += 1
+        if low is None or (high is not None and high < low):
+            r = high
+        else:
+            r = low
+        memo[f] = r
+        return r
+
+    ## the sets of the family f with the fewest rows, as a family
+    def smallest(self, f, memo=None):
+        if memo is None:
+            memo = {}
+        if f < 2:
+            return f
+        key = ("smallest", f)
+        r = self.cache.get(key)
+        if r is not None:
+            return r
+        size = self.min_size(f, memo)
+        low = 0
+        high = 0
+        if self.min_size(self.low[f], memo) == size:
+            low = self.smallest(self.low[f], memo)
+        high_size = self.min_size(self.high[f], memo)
+        if high_size is not None and high_size + 1 == size:
+            high = self.smallest(self.high[f], memo)
+        r = self.node(self.row[f], low, high)
+        self.cache[key] = r
+        return r
+
+    ## the number of sets in the family f
+    def count(self, f, memo=None):
+        if memo is None:
+            memo = {}
+        if f < 2:
+            return f
+        if f not in memo:
+            memo[f] = self.count(self.low[f], memo) + self.count(self.high[f], memo)
+        return memo[f]
+
+    ## the list of the sets of the family f, each a sorted list of rows
+    def sets(self, f):
+        if f == 0:
+            return []
+        if f == 1:
+            return [[]]
+        result = self.sets(self.low[f])
+        for s in self.sets(self.high[f]):
+            result.append([self.row[f]] + s)
+        return result
+
+
+## petrick's method on the ZDD, for the chart (a list of row bitsets, see qm_userInputFile.build_chart).
+## if stats (a QMStats) is not None, the number of products after each multiplication step is recorded in it (as by
+## petrick_method), and the number of ZDD nodes made is counted.
+## returns the list of all the covers with the fewest rows, each a list of rows (same as petrick_method)
+def petrick_zdd(Chart, stats=None):
+    columns = {}
+    for row in range(len(Chart)):
+        for col in min_cover.indices_from_bits(Chart[row]):
+            columns.setdefault(col, []).append(row)
+    if len(columns) == 0:
+        return [[]]
+    ## the operations recurse once for each row of a set, allow it for the largest chart
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, 4 * len(Chart) + 1000))
+    try:
+        zdd = ZDD()
+        product = 1
+        ## the columns with fewer rows first, they keep the intermediate products small
+        for col in sorted(columns, key=lambda c: (len(columns[c]), c)):
+            product = zdd.multiply(product, columns[col])
+            zdd.cache = {}      ## the results of the earlier steps are not needed again
+            if stats is not None:
+                stats.petrick_sizes.append(zdd.count(product))
+        covers = zdd.sets(zdd.smallest(product))
+    finally:
+        sys.setrecursionlimit(limit)
+    if stats is not None:
+        stats.count("zdd_nodes", len(zdd.row) - 2)
+    return covers
@@ -16,19 +16,32 @@ the format for the configuration file is as follows:
         <value_count_min> <value_count_max>
         <type_of_table> : enumerated - 1: low merging, 2: medium merging, 3: high merging possible
         <num_of_entries_max_limit> : specify a number or 0 if no limit
+followed by the optional workload profile settings, one "<name> = <value>" in each line:
+        seed = <integer>                : seed of the random numbers, the tables are the same in every run (default: not seeded)
+        group_length = <min> <max>      : range of the length of the runs of the same mode, instead of the one of <type_of_table>
+        random_fraction = <fraction>    : fraction of the rows with a completely random mode (default: 0.05)
+        density = <fraction>            : fraction of the combinations present in the table, the others are missing (default: 1)
+        pattern = runs | blocks         : modes assigned to runs of consecutive combinations (default), or to blocks
+        block_size = <min> <max>        : range of the width of the blocks along each variable, for the blocks pattern (default: 2 4)
 
 Following is the algorithm followed for this:
-        1. generate all combinations of different variables and store them in a list. we use itertools to accomplish the same. the combinations are stored in lexicographic order in the list.
+        1. generate the combinations of different variables in lexicographic order, one at a time as they are written (by mixed radix
+           unranking and counting), so that the memory does not grow with the size of the table.
            This helps to ensure that the same entry is not repeated in the table, and also simplifies control of the merging capability.
         2. based on the type of table needed, the mode assignment is done. Same mode is assigned for continuous items from the list if higher merging is chosen
-        3. We generate 95% of entries as per the merging level, while remaining 5% are completely random generated
+           with the blocks pattern, the range of each variable is split into segments of random widths, and each block (a combination of
+           the segments of all the variables) is assigned a random mode.
+        3. We generate 95% of entries as per the merging level, while remaining 5% are completely random generated (as per random_fraction).
+           with the runs pattern, the random entries are the last ones. with the blocks pattern, each entry is a random one with this probability.
+        4. if the density is below 1, each combination is skipped with the probability 1 - density.
 '''
 
-import sys
 import math
 import os
 import random
-import itertools
+import zlib
+import argparse
+import multiprocessing
 
 ##class to contain various configuration settings, parsed from the file
 class Config:
@@ -41,6 +54,15 @@ class Config:
     value_count_max = 0         ## maximum number of values for each variable
     type_of_table = 0           ## type of table - enumerated as 1, 2, 3
     num_of_entries_max = 0      ## maximum number of entries. the actual number is a minimum of this or the maximum possible entries, as per randomly chosen variables, etc.
+    ## the workload profile, the optional settings
+    seed = None                 ## seed of the random numbers, None to use the random numbers of the random module (not seeded)
+    group_length_min = None     ## range of the length of the runs of the same mode, None for the range as per type_of_table
+    group_length_max = None
+    random_fraction = 0.05      ## fraction of the entries with a random mode
+    density = 1.0               ## fraction of the combinations present in the table
+    pattern = "runs"            ## "runs" of consecutive combinations, or "blocks"
+    block_size_min = 2          ## range of the width of a block along each variable
+    block_size_max = 4
 
 ## procedure to parse the config file and update the class Config based on the same
 def parse_config_file(file_name):
@@ -63,33 +85,130 @@ def parse_config_file(file_name):
     cfg.value_count_max = int(t[1])
     cfg.type_of_table = int(contents[4])
     cfg.num_of_entries_max = int(contents[5])
+    for line in contents[6:]:
+        parse_profile_line(cfg, line)
     fp.close()
     return cfg
 
-## generate a random number between minimum and maximum
-def generate_random(minimum, maximum):
-    return random.randint(minimum, maximum)
+## parse one line of the workload profile settings ("<name> = <value>") and update the cfg. comments start with ##.
+## raises ValueError for an unknown name or an invalid value.
+def parse_profile_line(cfg, line):
+    line = line.split("##")[0].strip()
+    if line == '':
+        return
+    if "=" not in line:
+        raise ValueError("expected <name> = <value>, found '%s'" % line)
+    name, value = [t.strip() for t in line.split("=", 1)]
+    t = value.split()
+    if name == "seed":
+        cfg.seed = int(value)
+    elif name == "group_length":
+        cfg.group_length_min = int(t[0])
+        cfg.group_length_max = int(t[-1])
+    elif name == "random_fraction":
+        cfg.random_fraction = float(value)
+    elif name == "density":
+        cfg.density = float(value)
+    elif name == "pattern":
+        if value not in ("runs", "blocks"):
+            raise ValueError("the pattern must be runs or blocks, found '%s'" % value)
+        cfg.pattern = value
+    elif name == "block_size":
+        cfg.block_size_min = int(t[0])
+        cfg.block_size_max = int(t[-1])
+    else:
+        raise ValueError("unknown setting '%s'" % name)
+    if not (0 <= cfg.random_fraction <= 1 and 0 < cfg.density <= 1):
+        raise ValueError("random_fraction must be within 0 to 1, and density within 0 (excluded) to 1")
 
 ## generate a random number between minimum and maximum
-def generate_all_combinations(num_var, var_list):
-    prod = ()
-    l = list(prod)
-    for i in range(num_var):
-        var_values = range(var_list[i])     ## var_list contains the maximum value for each variable
-        l.append(var_values)        ## l contains the different values for each variable
-    prod = tuple(l)
-    product_list = itertools.product(*prod, repeat=1)       ## use itertools to generate all combinations of the variables
-    complete_list = []
-    for l in product_list:
-        ljoined = ",".join(str(w) for w in l)               ## add comma in between each variable of the list to match the required format for output
-        complete_list.append(ljoined)                       
-    return complete_list                                    ## return the list containing all combinations of the variables
+## rng is the random number generator, a random.Random or the random module itself
+def generate_random(minimum, maximum, rng=random):
+    return rng.randint(minimum, maximum)
+
+## returns the combination number index (in the lexicographic order of itertools.product) of the values of the variables,
+## i.e. the mixed radix digits of index with the radix var_list[i] for the variable i, the first variable being the most significant
+def unrank_combination(index, var_list):
+    values = [0] * len(var_list)
+    for i in range(len(var_list) - 1, -1, -1):
+        index, values[i] = divmod(index, var_list[i])
+    return values
+
+## generate the combinations of the variables on demand, in the lexicographic order starting from the combination number start.
+## each combination is yielded as a string in the table format (values separated by comma).
+## only the current combination is held in memory: the first one is found by unranking, the next ones by incrementing it
+## as a mixed radix counter.
+def generate_combinations(var_list, start=0):
+    num_var = len(var_list)
+    total = 1
+    for lim in var_list:
+        total *= lim
+    if start >= total:
+        return
+    values = unrank_combination(start, var_list)
+    strings = [str(v) for v in values]
+    for index in xrange(start, total):
+        yield ",".join(strings)
+        ## increment the counter, the last variable first
+        i = num_var - 1
+        while i >= 0:
+            values[i] += 1
+            if values[i] < var_list[i]:
+                strings[i] = str(values[i])
+                break
+            values[i] = 0
+            strings[i] = "0"
+            i -= 1
+
+## buffered writer, the lines are collected and written in bulk to reduce the number of write calls
+class BufferedLines:
+    def __init__(self, fout, size=65536):
+        self.fout = fout
+        self.size = size            ## number of lines collected before a write
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+        if len(self.lines) >= self.size:
+            self.flush()
+
+    def flush(self):
+        if self.lines:
+            self.fout.write("".join(self.lines))
+            self.lines = []
+
+## the range of the length of the runs of the same mode, as per the workload profile or else the type of table.
+## the range of values for random number are empirically assigned.
+def group_length_range(cfg):
+    if cfg.group_length_min is not None:
+        return cfg.group_length_min, cfg.group_length_max
+    if cfg.type_of_table == 1:
+        return 1, 3
+    elif cfg.type_of_table == 2:
+        return 6, 9
+    return 18, 22
+
+## skip each combination with the probability 1 - density
+def present_combinations(combinations, density, rng):
+    if density >= 1:
+        for c in combinations:
+            yield c
+        return
+    for c in combinations:
+        if rng.random() < density:
+            yield c
 
 ## generate one table based on selected configuration
-def generate_one_table(file_name, cfg):
+## the table is streamed to the file, so that the memory used does not depend on the size of the table
+## rng is the random number generator. by default, a random.Random seeded with cfg.seed, or the random module if there is no seed.
+def generate_one_table(file_name, cfg, rng=None):
+    if rng is None:
+        rng = random
+        if cfg.seed is not None:
+            rng = random.Random(cfg.seed)
     var_limits = []
-    num_var = generate_random(cfg.num_of_var_min, cfg.num_of_var_max)               ## generate number of variables
-    num_modes = generate_random(cfg.num_of_modes_min, cfg.num_of_modes_max)         ## number of modes
+    num_var = generate_random(cfg.num_of_var_min, cfg.num_of_var_max, rng)          ## generate number of variables
+    num_modes = generate_random(cfg.num_of_modes_min, cfg.num_of_modes_max, rng)    ## number of modes
 
     fout = open(file_name, "w+")
     fout.write(str(num_var)+"\n")
@@ -97,53 +216,92 @@ def generate_one_table(file_name, cfg):
 
     valid_combinations = 1                                              ## refers to the count of valid combinations as per randomly generated num_var, num_modes and value counts
     for i in range(num_var):
-        lim = generate_random(cfg.value_count_min, cfg.value_count_max)
+        lim = generate_random(cfg.value_count_min, cfg.value_count_max, rng)
         var_limits.append(lim)
         s = "0 " + str(lim) + " 1\n"                                ## defaulting the step count for each variable to 1. can be made real number to allow finer ranges
         fout.write(s)
         valid_combinations *= (lim)                                 ## multiply the maximum value for calculating the total valid combinations
     print valid_combinations
-    table_entries = min(cfg.num_of_entries_max, valid_combinations)     ## total number of entries is the minimum of valid combinations, or the limit in the config file
-    total_structured_entries = int(0.95*table_entries)                  ## 95% entries are generated as per the merging level, 5% are completely random
+    present = int(valid_combinations * cfg.density)                     ## the expected number of combinations present, as per the density
+    table_entries = min(cfg.num_of_entries_max, present)                ## total number of entries is the minimum of valid combinations, or the limit in the config file
+    if cfg.num_of_entries_max == 0:                                     ## no limit
+        table_entries = present
+    total_structured_entries = int((1 - cfg.random_fraction)*table_entries)     ## 95% entries are generated as per the merging level, 5% are completely random
     total_random_entries = table_entries - total_structured_entries
     print total_structured_entries, total_random_entries
 
-    complete_list = generate_all_combinations(num_var, var_limits)      
-    list_index = 0
+    ## the combinations in the lexicographic order, made on demand, with the missing ones skipped as per the density
+    combinations = present_combinations(generate_combinations(var_limits), cfg.density, rng)
+    out = BufferedLines(fout)
+    if cfg.pattern == "blocks":
+        write_blocks(out, combinations, var_limits, num_modes, table_entries, cfg, rng)
+    else:
+        write_runs(out, combinations, num_modes, total_structured_entries, total_random_entries, cfg, rng)
+    out.flush()
+    fout.close()
+
+## write the entries with the modes assigned to runs of consecutive combinations, followed by the random entries
+## the table may have fewer entries if the combinations run out (with a density below 1)
+def write_runs(out, combinations, num_modes, total_structured_entries, total_random_entries, cfg, rng):
+    group_min, group_max = group_length_range(cfg)
     str_entry_count = 0
 ## generate the table based on type of table. if low merging, less number of continuous modes are assigned to the sorted list of combinations
     while str_entry_count < total_structured_entries:
             ##random count within a range, depending upon the merging level. this count denotes how many continuous entries are assigned the same mode.
-            ## the range of values for random number are empirically assigned.
-        if cfg.type_of_table == 1:
-            mode = generate_random(0, num_modes-1)
-            group_length = generate_random(1,3)
-        elif cfg.type_of_table == 2:
-            mode = generate_random(0, num_modes-1)
-            group_length = generate_random(6,9)
-        elif cfg.type_of_table == 3:
-            mode = generate_random(0, num_modes-1)
-            group_length = generate_random(18,22)
+        mode = generate_random(0, num_modes-1, rng)
+        group_length = generate_random(group_min, group_max, rng)
             ## based on the count, assign the mode to the continuous minterms in the complete list
+        suffix = ":" + str(mode) + "\n"
         for i in range(group_length):
-            l = complete_list[list_index]
-            lj = l + ":" + str(mode) + "\n"
+            c = next(combinations, None)
+            if c is None:
+                return
+            out.write(c + suffix)
             str_entry_count += 1
-            list_index += 1
-            fout.write(lj)
             if str_entry_count == total_structured_entries:
                 break
 
     ## generate the table for 5% of completely random combinations
     random_entry_count = 0
     while random_entry_count < total_random_entries:
-        mode = generate_random(0, num_modes-1)
-        l = complete_list[list_index]
-        lj = l + ":" + str(mode) + "\n"
+        mode = generate_random(0, num_modes-1, rng)
+        c = next(combinations, None)
+        if c is None:
+            return
+        out.write(c + ":" + str(mode) + "\n")
         random_entry_count += 1
-        list_index += 1
-        fout.write(lj)
-    fout.close()
+
+## write the entries with the modes assigned to blocks: the range of each variable is split into segments of random widths,
+## and the mode of a block (one segment of each variable) is a hash of the segments, so that no block needs to be stored.
+## each entry has a random mode instead with the probability random_fraction.
+def write_blocks(out, combinations, var_limits, num_modes, table_entries, cfg, rng):
+    segment_of = []             ## segment_of[i][v] is the segment of the value v of the variable i
+    for lim in var_limits:
+        segments = []
+        segment = 0
+        while len(segments) < lim:
+            width = generate_random(cfg.block_size_min, cfg.block_size_max, rng)
+            segments.extend([segment] * width)
+            segment += 1
+        segment_of.append(segments[:lim])
+    salt = rng.getrandbits(32)
+    for count in xrange(table_entries):
+        c = next(combinations, None)
+        if c is None:
+            return
+        if rng.random() < cfg.random_fraction:
+            mode = generate_random(0, num_modes-1, rng)
+        else:
+            values = c.split(",")
+            block = ",".join(str(segment_of[i][int(values[i])]) for i in range(len(values)))
+            mode = (zlib.crc32("%d:%s" % (salt, block)) & 0xffffffff) % num_modes
+        out.write(c + ":" + str(mode) + "\n")
+
+## generate one table in a worker process. job is (file name, cfg, seed of the random numbers for this table)
+def generate_table_job(job):
+    file_name, cfg, seed = job
+    generate_one_table(file_name, cfg, random.Random(seed))
+    return file_name
 
 ## this function assigns file name for generating multiple unique tables.
 ## based on specified output file name, the suffix _num is assigned, starting from 0.
@@ -162,25 +320,45 @@ def get_file_name(out_file, count):
 
 ## main function.
 ## takes arguments from the command line and passes to different function.
+## each table gets its own random seed (drawn in order from the main random sequence, seeded by the seed in the cfg file if any),
+## so that the tables are the same whether they are generated one after another or in parallel.
 def main():
-    arguments = sys.argv[1:]
-    ## error out if wrong usage on the command line
-    if len(arguments) < 2:
-        print "\nError: the expected usage is:\n"
-        print "python generate_tables_linear_controlled_compression.py <cfg file name> <output file name>\n"
-        print "example: python generate_tables_linear_controlled_compression.py gen_table.cfg table.txt\n"
-        return
+    parser = argparse.ArgumentParser(description="Runtime controller generation for CAES: generate random tables",
+                                     epilog="example: python generate_tables.py gen_table.cfg table.txt")
+    parser.add_argument("cfg_file", help="configuration file")
+    parser.add_argument("out_file", help="output file name, the table number is added to it (e.g. table_0.txt)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="number of worker processes to generate the tables in parallel, 0 for one per cpu (default: 1)")
+    args = parser.parse_args()
 
     print "Runtime controller generation for CAES"
     print "Generate random tables for different scenarios"
-    in_file = arguments[0]
-    out_file = arguments[1]
+    in_file = args.cfg_file
+    out_file = args.out_file
     cfg = Config()                  ## create the cfg instance of Config class containing values from the file.
     cfg = parse_config_file(in_file)        ## assign values to cfg
 #    print cfg.num_of_tables,  cfg.num_of_var_min,  cfg.num_of_var_max, cfg.num_of_modes_min , cfg.num_of_modes_max,  cfg.type_of_table, cfg.num_of_entries_max 
+    rng = random
+    if cfg.seed is not None:
+        rng = random.Random(cfg.seed)
+    jobs = []
     for count in range (cfg.num_of_tables):     ## repeat the loop for the number of tables required to be generated
         out_file_name = get_file_name(out_file, count)  ## generate file name as per the iteration count
-        generate_one_table(out_file_name, cfg)          ## generate one table for the particular file name
+        jobs.append((out_file_name, cfg, rng.getrandbits(64)))
+
+    num_jobs = args.jobs
+    if num_jobs == 0:
+        num_jobs = multiprocessing.cpu_count()
+    if num_jobs > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(num_jobs, len(jobs)))
+        try:
+            pool.map(generate_table_job, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for job in jobs:
+            generate_table_job(job)          ## generate one table for the particular file name
 
 if __name__ == "__main__":
     main()